@@ -0,0 +1,250 @@
+"""
+Ingestion benchmark
+This script measures how reading the CSSE daily reports scales with the size of the data.
+Synthetic daily reports are generated in the CSSE format and served from a local HTTP server,
+then read with read_data.read_levels. For each combination of settings, the following ingests
+are measured:
+
+full        Read all reports, downloading each one (no report cache).
+cached      Read all reports from a warm on-disk report cache.
+incremental Update a snapshot that is missing the last "incremental_days" days.
+
+Each ingest runs in a fresh process, and its wall time, peak memory use (RSS) and number of
+HTTP requests (reports served, and requests for dates with no report) are printed, and
+optionally saved to a CSV file. Reports are read through the last synthetic date.
+"""
+
+#Import packages & other scripts
+import os, sys
+import time
+import shutil
+import resource
+import tempfile
+import functools
+import threading
+import http.server
+import multiprocessing
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+import fetch_data
+import read_data
+
+#========================================================================================================
+# User-defined settings
+#========================================================================================================
+
+#Number of US rows per daily report (50 for states, up to about 3,300 for counties)
+regions = [50,3300]
+
+#Number of days of reports, starting on January 22nd 2020
+days = [60,1000]
+
+#Report format ("early" for "Province/State" headers, "late" for "Province_State" headers with
+#county columns, or "mixed" to switch from early to late on March 22nd 2020, as in the CSSE data)
+schemas = ['mixed']
+
+#Datasets to read ("us", "world", or both in a single pass)
+levels = ['us','world']
+
+#Number of days missing from the snapshot in the incremental ingest
+incremental_days = 5
+
+#Number of concurrent downloads, and number of processes used to parse reports
+workers = 8
+processes = None
+
+#Path of a CSV file to save results to. If None, results are only printed.
+output_path = None
+
+#========================================================================================================
+# Synthetic reports
+#========================================================================================================
+
+#Date the CSSE daily reports switched to the late format
+LATE_SCHEMA_DATE = dt.datetime(2020,3,22)
+
+EARLY_HEADER = ['Province/State','Country/Region','Last Update','Confirmed','Deaths','Recovered']
+LATE_HEADER = ['FIPS','Admin2','Province_State','Country_Region','Last_Update','Lat','Long_',
+               'Confirmed','Deaths','Recovered','Active','Combined_Key']
+
+def generate_reports(directory,n_regions,n_days,schema='mixed',first_day=0,seed=0):
+    """
+    Writes synthetic CSSE daily reports to a directory.
+
+    Parameters:
+    ----------------------
+    directory
+        Directory to write reports to, named "MM-DD-YYYY.csv".
+    n_regions
+        Number of US rows per report. Rows are spread evenly across the US states, so values
+        above 50 emulate county-level reports.
+    n_days
+        Number of days of reports to write, starting on January 22nd 2020.
+    schema
+        Report format ("early", "late" or "mixed").
+    first_day
+        Index of the first day to write. Earlier days are assumed to already exist.
+    seed
+        Seed of the random number generator. Counts for each day depend only on the seed and
+        day index, so reports can be written in several batches.
+    """
+
+    states = list(pd.read_csv("data/2019_us_population.csv")['State'])
+    countries = [country for country in pd.read_csv("data/2019_world_population.csv")['Country'] if country != 'US']
+
+    #Names of each row, with one row per country and n_regions rows for the US
+    provinces = [states[i % len(states)] for i in range(n_regions)] + ['']*len(countries)
+    counties = [f"County {i // len(states)}" for i in range(n_regions)] + ['']*len(countries)
+    nations = ['US']*n_regions + countries
+    n_rows = len(nations)
+
+    #Cumulative counts that increase by a random amount each day
+    rng = np.random.default_rng(seed)
+    growth = rng.integers(0,50,size=(n_days,n_rows,3))
+    totals = np.cumsum(growth,axis=0)
+
+    os.makedirs(directory,exist_ok=True)
+    for day in range(first_day,n_days):
+        date = fetch_data.FIRST_REPORT_DATE + dt.timedelta(days=day)
+        confirmed = totals[day,:,0]*4
+        deaths = totals[day,:,1]//4
+        recovered = totals[day,:,2]
+
+        late = schema == 'late' or (schema == 'mixed' and date >= LATE_SCHEMA_DATE)
+        if late == True:
+            df = pd.DataFrame({'FIPS':np.arange(n_rows),'Admin2':counties,'Province_State':provinces,
+                               'Country_Region':nations,'Last_Update':date.strftime('%Y-%m-%d 23:59:00'),
+                               'Lat':0.0,'Long_':0.0,'Confirmed':confirmed,'Deaths':deaths,'Recovered':recovered,
+                               'Active':confirmed-deaths-recovered,'Combined_Key':''},columns=LATE_HEADER)
+        else:
+            df = pd.DataFrame({'Province/State':provinces,'Country/Region':nations,
+                               'Last Update':date.strftime('%Y-%m-%dT23:59:00'),'Confirmed':confirmed,
+                               'Deaths':deaths,'Recovered':recovered},columns=EARLY_HEADER)
+        df.to_csv(os.path.join(directory,f"{date.strftime('%m-%d-%Y')}.csv"),index=False)
+
+#========================================================================================================
+# Local report server
+#========================================================================================================
+
+class CountingHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves files from a directory, counting requests for existing and missing files.
+    """
+
+    counts = {'served':0,'missing':0}
+
+    def log_message(self,*args):
+        pass
+
+    def do_GET(self):
+        exists = os.path.isfile(self.translate_path(self.path))
+        CountingHandler.counts['served' if exists == True else 'missing'] += 1
+        return super().do_GET()
+
+def start_server(directory):
+    """
+    Starts a local HTTP server for a directory of reports. Returns the server and its URL.
+    """
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1',0),functools.partial(CountingHandler,directory=directory))
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+#========================================================================================================
+# Measurements
+#========================================================================================================
+
+def _ingest(levels,base_url,end,cache_dir,update_from,save_to,workers,processes,queue):
+    """
+    Runs one ingest in a child process, returning wall time and peak RSS through a queue.
+    """
+
+    start = time.perf_counter()
+    output = read_data.read_levels(levels,workers=workers,base_url=base_url,cache_dir=cache_dir,
+                                   update_from=update_from,processes=processes,end=end)
+    elapsed = time.perf_counter() - start
+
+    if save_to is not None:
+        for level in levels:
+            output[level]['cases'].save(os.path.join(save_to,f'cases_{level}'))
+
+    #Peak RSS is reported in kilobytes on Linux, and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': peak = peak / 1024
+    queue.put({'seconds':elapsed,'peak_rss_mb':peak/1024,
+               'stored_dates':len(output[levels[0]]['dates']),'stored_regions':len(output[levels[0]]['cases'])})
+
+def measure(levels,base_url,end,cache_dir=None,update_from=None,save_to=None):
+    """
+    Runs an ingest in a fresh process and returns its measurements.
+    """
+
+    CountingHandler.counts.update({'served':0,'missing':0})
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_ingest,args=(levels,base_url,end,cache_dir,update_from,save_to,workers,processes,queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0: raise RuntimeError(f"Ingest failed with exit code {process.exitcode}")
+    result = queue.get()
+    result.update(CountingHandler.counts)
+    return result
+
+def run_case(n_regions,n_days,schema,work_dir):
+    """
+    Generates reports for one combination of settings and measures each type of ingest.
+    """
+
+    report_dir = os.path.join(work_dir,'reports')
+    cache_dir = os.path.join(work_dir,'cache')
+    snapshot_dir = os.path.join(work_dir,'snapshots')
+    for directory in [report_dir,cache_dir,snapshot_dir]:
+        shutil.rmtree(directory,ignore_errors=True)
+
+    server, base_url = start_server(report_dir)
+    end = fetch_data.FIRST_REPORT_DATE + dt.timedelta(days=n_days-1)
+    results = []
+    try:
+        #Full ingests, without and with the report cache
+        generate_reports(report_dir,n_regions,n_days,schema)
+        results.append(('full',measure(levels,base_url,end)))
+        measure(levels,base_url,end,cache_dir=cache_dir)
+        results.append(('cached',measure(levels,base_url,end,cache_dir=cache_dir)))
+
+        #Incremental ingest, from a snapshot missing the last days
+        n_snapshot = max(n_days-incremental_days,1)
+        shutil.rmtree(report_dir)
+        generate_reports(report_dir,n_regions,n_snapshot,schema)
+        measure(levels,base_url,end-dt.timedelta(days=n_days-n_snapshot),save_to=snapshot_dir)
+        generate_reports(report_dir,n_regions,n_days,schema,first_day=n_snapshot)
+        update_from = {level:os.path.join(snapshot_dir,f'cases_{level}') for level in levels}
+        results.append(('incremental',measure(levels,base_url,end,update_from=update_from)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return [dict(ingest=ingest,regions=n_regions,days=n_days,schema=schema,**result) for ingest,result in results]
+
+#========================================================================================================
+# Run benchmark
+#========================================================================================================
+
+if __name__ == '__main__':
+    work_dir = tempfile.mkdtemp(prefix='benchmark_ingest_')
+    rows = []
+    try:
+        for schema in schemas:
+            for n_days in days:
+                for n_regions in regions:
+                    for row in run_case(n_regions,n_days,schema,work_dir):
+                        rows.append(row)
+                        print(f"{row['ingest']:<12} regions={n_regions:<5} days={n_days:<5} schema={schema:<6} "+
+                              f"time={row['seconds']:8.2f}s  peak_rss={row['peak_rss_mb']:8.1f}MB  "+
+                              f"served={row['served']:<5} missing={row['missing']}")
+    finally:
+        shutil.rmtree(work_dir,ignore_errors=True)
+
+    if output_path is not None:
+        pd.DataFrame(rows).to_csv(output_path,index=False)
@@ -2,6 +2,10 @@ import os, sys
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as col
+from matplotlib.figure import Figure
+from matplotlib.patches import PathPatch
+from matplotlib.collections import PatchCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 
 import cartopy
@@ -42,6 +46,9 @@ class Map():
         self.ax = ax
         self.res = res
         
+        #Base layers rendered by drawbase(), keyed by extent, axes position, figure size and layers
+        self.base_layers = {}
+        
     def check_for_digits(self,text):
         """
         Checks if a string contains digits.
@@ -317,6 +324,135 @@ class Map():
         #Return value
         return counties
     
+    def choropleth(self,paths,values,color_obj=None,cmap=None,norm=None,empty_color=None,ax=None,**kwargs):
+        """
+        Fills regions by value, drawing all regions as a single PatchCollection.
+        
+        Parameters:
+        ----------------------
+        paths
+            Dict of {region: matplotlib Path} with region outlines in map coordinates, e.g., as
+            returned by state_geometries.load().
+        values
+            Dict of {region: value}. Only regions in both paths and values are drawn.
+        color_obj
+            Gradient instance used to color values. If None, cmap and norm are used.
+        cmap
+            Matplotlib colormap used to color values, if color_obj is None.
+        norm
+            Matplotlib normalization used with cmap, if color_obj is None.
+        empty_color
+            Fill color for regions with a value of zero or below, or NaN. If None, these regions
+            are colored like any other value. Default is None.
+        ax
+            Axes instance, if not None then overrides the default axes instance.
+        **kwargs
+            Additional arguments passed to PatchCollection (e.g., edgecolor, linewidth, alpha).
+            
+        Returns:
+        ----------------------
+        matplotlib.collections.PatchCollection instance. Its "regions" attribute lists the regions
+        in the order of its patches.
+        """
+        
+        #Get current axes if not specified
+        ax = ax or self._check_ax()
+        
+        #Get regions to draw
+        regions = [region for region in paths.keys() if region in values.keys()]
+        collection = PatchCollection([PathPatch(paths[region]) for region in regions],transform=ax.transData,**kwargs)
+        collection.regions = regions
+        self.set_choropleth_values(collection,values,color_obj,cmap,norm,empty_color)
+        
+        #Add to axes without changing the map extent
+        ax.add_collection(collection,autolim=False)
+        return collection
+    
+    def set_choropleth_values(self,collection,values,color_obj=None,cmap=None,norm=None,empty_color=None):
+        """
+        Updates the face colors of a collection returned by choropleth() for new values, without
+        redrawing its regions. See choropleth() for a description of the arguments.
+        """
+        
+        data = np.array([values.get(region,np.nan) for region in collection.regions],dtype=np.float64)
+        
+        #Get face colors for all values at once
+        filled = np.ones(len(data),dtype=bool) if empty_color is None else data > 0
+        facecolors = np.tile(col.to_rgba(empty_color or 'none'),(len(data),1))
+        if np.any(filled) == True:
+            if color_obj is not None:
+                facecolors[filled,:3] = color_obj.get_rgb(data[filled]) / 255.0
+                facecolors[filled,3] = 1.0
+            else:
+                cmap = plt.get_cmap(cmap)
+                if norm is None: norm = col.Normalize(vmin=np.nanmin(data[filled]),vmax=np.nanmax(data[filled]))
+                facecolors[filled] = cmap(norm(data[filled]))
+        collection.set_facecolor(facecolors)
+    
+    def drawbase(self,layers=['drawstates','drawcoastlines','drawcountries'],background=None,ax=None,zorder=0):
+        """
+        Draws static geography as a single image. The geography is rendered once for each map extent,
+        axes position, figure size and DPI, and the cached image is reused on subsequent calls, so
+        maps plotted repeatedly (e.g., for several dates) only draw their data layers.
+        
+        Parameters:
+        ----------------------
+        layers
+            List of Map methods to draw, either as method names or as (method name, kwargs) tuples,
+            e.g., ['drawstates',('drawcoastlines',{'linewidths':0.8})]. Default is states, coastlines
+            and countries.
+        background
+            If not None, a dict with the "name" and "resolution" of a background image, which is drawn
+            below the layers using cartopy's ax.background_img() function. Default is None.
+        ax
+            Axes instance, if not None then overrides the default axes instance. The map extent should
+            be set before calling this function.
+        zorder
+            zorder of the image (default is 0).
+            
+        Returns:
+        ----------------------
+        matplotlib.image.AxesImage instance of the base layers
+        """
+        
+        #Get current axes if not specified
+        ax = ax or self._check_ax()
+        fig = ax.figure
+        
+        #Get final axes position, adjusted for the map's aspect ratio
+        ax.apply_aspect()
+        extent = tuple(np.round(ax.get_extent(crs=self.proj),6))
+        position = tuple(np.round(ax.get_position().bounds,6))
+        key = (extent,position,tuple(fig.get_size_inches()),fig.dpi,repr(layers),repr(background))
+        
+        #Render base layers on a transparent offscreen figure matching this axes
+        if key not in self.base_layers:
+            base_fig = Figure(figsize=fig.get_size_inches(),dpi=fig.dpi)
+            canvas = FigureCanvasAgg(base_fig)
+            base_fig.patch.set_visible(False)
+            base_ax = base_fig.add_axes(position,projection=self.proj)
+            base_ax.set_extent(extent,crs=self.proj)
+            base_ax.set_axis_off()
+            base_ax.patch.set_visible(False)
+            
+            if background is not None:
+                base_ax.background_img(name=background['name'],resolution=background['resolution'])
+            for layer in layers:
+                name, kwargs = (layer,{}) if isinstance(layer,str) else layer
+                getattr(self,name)(ax=base_ax,**kwargs)
+            
+            #Crop the rendered figure to the axes area
+            canvas.draw()
+            image = np.asarray(canvas.buffer_rgba())
+            bbox = base_ax.get_window_extent()
+            height = image.shape[0]
+            self.base_layers[key] = image[int(round(height-bbox.y1)):int(round(height-bbox.y0)),
+                                          int(round(bbox.x0)):int(round(bbox.x1))].copy()
+        
+        #Draw cached image, which is already in map coordinates
+        return ax.imshow(self.base_layers[key],extent=extent,origin='upper',transform=self.proj,
+                         interpolation='nearest',zorder=zorder)
+    
     def _check_ax(self):
         """
         Adapted from Basemap - checks to see if an axis is specified, if not, returns plt.gca().
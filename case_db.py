@@ -0,0 +1,154 @@
+"""
+SQLite case database
+This module stores daily case data in a local SQLite database, with one row per dataset,
+region and date and one column per metric. Rows are indexed by (scope, region, date) and
+(scope, date), so single-region time series and single-day rankings can be queried without
+loading or rebuilding the full history.
+"""
+
+import sqlite3
+import datetime as dt
+import numpy as np
+
+from case_store import METRIC_DTYPES
+
+#Metric columns stored in the database
+METRICS = list(METRIC_DTYPES.keys())
+
+class CaseDatabase:
+
+    def __init__(self,path='cases.sqlite',scope='us'):
+        """
+        Open (or create) a case database.
+
+        Parameters:
+        ----------------------
+        path
+            Path of the SQLite database file (default is "cases.sqlite").
+        scope
+            String denoting the dataset to read and write ("us" or "world"). Multiple
+            datasets can share one database file.
+
+        Returns:
+        ----------------------
+        Instance of a CaseDatabase object
+        """
+
+        self.path = path
+        self.scope = scope
+        self.connection = sqlite3.connect(path)
+
+        columns = ', '.join([f"{metric} {'INTEGER' if np.issubdtype(METRIC_DTYPES[metric],np.integer) else 'REAL'}"
+                             for metric in METRICS])
+        with self.connection:
+            self.connection.execute(f"""CREATE TABLE IF NOT EXISTS cases (
+                                        scope TEXT NOT NULL, region TEXT NOT NULL, date TEXT NOT NULL, {columns},
+                                        PRIMARY KEY (scope, region, date)) WITHOUT ROWID""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS cases_by_date ON cases (scope, date)")
+
+    def close(self):
+        self.connection.close()
+
+    def _check_metric(self,metric):
+        if metric not in METRICS: raise ValueError(f"Unknown metric: {metric}")
+
+    def write(self,cases,start=None):
+        """
+        Writes the values of a CaseStore to the database, replacing existing rows for the
+        same regions and dates.
+
+        Parameters:
+        ----------------------
+        cases
+            CaseStore instance to write.
+        start
+            First date to write. If None, all dates are written.
+
+        Returns:
+        ----------------------
+        Number of rows written
+        """
+
+        start = 0 if start is None else cases.date_index(start)
+        dates = [str(date) for date in cases.dates[start:]]
+        if len(dates) == 0 or len(cases) == 0: return 0
+
+        #One column per metric, flattened in (region, date) order
+        metrics = [metric for metric in METRICS if metric in cases.metrics]
+        regions = np.repeat(np.array(cases.keys(),dtype=object),len(dates))
+        values = [cases.values(metric,start=start).ravel().tolist() for metric in metrics]
+        rows = zip([self.scope]*len(regions),regions.tolist(),dates*len(cases),*values)
+
+        columns = ', '.join(['scope','region','date'] + metrics)
+        placeholders = ', '.join(['?']*(len(metrics)+3))
+        with self.connection:
+            self.connection.executemany(f"INSERT OR REPLACE INTO cases ({columns}) VALUES ({placeholders})",rows)
+        return len(regions)
+
+    def get_series(self,region,metric,start=None,end=None):
+        """
+        Returns the time series of a metric for one region.
+
+        Parameters:
+        ----------------------
+        region
+            Region name (e.g., "new york").
+        metric
+            Metric name (e.g., "confirmed" or "daily").
+        start
+            First date to return (inclusive). If None, starts at the first date.
+        end
+            Last date to return (inclusive). If None, ends at the last date.
+
+        Returns:
+        ----------------------
+        Tuple of (list of datetime objects, NumPy array of values). Missing values are NaN.
+        """
+
+        self._check_metric(metric)
+        query = f"SELECT date, {metric} FROM cases WHERE scope = ? AND region = ?"
+        params = [self.scope,region]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start.strftime('%Y-%m-%d'))
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(end.strftime('%Y-%m-%d'))
+        rows = self.connection.execute(query+" ORDER BY date",params).fetchall()
+
+        dates = [dt.datetime.strptime(row[0],'%Y-%m-%d') for row in rows]
+        values = np.array([np.nan if row[1] is None else row[1] for row in rows],dtype=np.float64)
+        return dates, values
+
+    def latest(self,metric,top_n=10,date=None):
+        """
+        Returns the regions with the highest values of a metric on one date.
+
+        Parameters:
+        ----------------------
+        metric
+            Metric name to rank by.
+        top_n
+            Number of regions to return (default is 10). If None, all regions are returned.
+        date
+            Date to rank on. If None, the latest date in the database is used.
+
+        Returns:
+        ----------------------
+        List of (region, value) tuples, sorted from highest to lowest value
+        """
+
+        self._check_metric(metric)
+        if date is None:
+            date = self.connection.execute("SELECT MAX(date) FROM cases WHERE scope = ?",[self.scope]).fetchone()[0]
+            if date is None: return []
+        else:
+            date = date.strftime('%Y-%m-%d')
+
+        query = f"""SELECT region, {metric} FROM cases WHERE scope = ? AND date = ? AND {metric} IS NOT NULL
+                    ORDER BY {metric} DESC"""
+        params = [self.scope,date]
+        if top_n is not None:
+            query += " LIMIT ?"
+            params.append(int(top_n))
+        return [tuple(row) for row in self.connection.execute(query,params).fetchall()]
@@ -0,0 +1,649 @@
+"""
+Columnar case store
+This class stores COVID-19 case data as one NumPy array per metric, with one row per
+region and one column per report date. Regions are looked up through a name -> row index,
+and the date axis is stored as datetime64. Dict-style access (cases[region][metric]) is
+provided through thin per-region views, so scripts written against the original
+dict-of-lists structure keep working unchanged.
+
+Only the raw cumulative metrics (confirmed, deaths, recovered) are stored. Derived metrics
+(active, daily, daily_deaths, confirmed_normalized) are computed from them on first access,
+memoized, and recomputed only for the columns that changed since.
+
+Stores can be saved as a snapshot directory holding one .npy file per raw metric plus an
+"index.json" file of regions, dates and options. Snapshots are opened as memory-mapped
+arrays, so only the parts of the arrays that are accessed are read from disk.
+"""
+
+import os
+import json
+import numpy as np
+
+#Data type used to store each metric
+METRIC_DTYPES = {
+    'confirmed':np.int32,
+    'confirmed_normalized':np.float32,
+    'deaths':np.int32,
+    'recovered':np.int32,
+    'active':np.int32,
+    'daily':np.float32,
+    'daily_deaths':np.float32,
+}
+
+#Metrics read in from the data sources
+RAW_METRICS = ['confirmed','deaths','recovered']
+
+#Metrics computed from the raw metrics
+DERIVED_METRICS = ['confirmed_normalized','active','daily','daily_deaths']
+
+#=============================================================================================
+# Region view class
+#=============================================================================================
+
+class RegionView:
+
+    def __init__(self,store,name):
+        """
+        Dict-style view of a single region within a CaseStore. Metric values are returned
+        as 1D NumPy views into the store.
+        """
+
+        self.store = store
+        self.name = name
+
+    def __getitem__(self,key):
+
+        if key == 'date': return self.store.date_list
+        if key in self.store.metrics: return self.store.values(key)[self.store.index[self.name]]
+        return self.store.extras[self.name][key]
+
+    def __setitem__(self,key,value):
+
+        if key in self.store.metrics:
+            self.store._ensure_writable()
+            self.store.values(key)[self.store.index[self.name]] = value
+            if key in RAW_METRICS: self.store.invalidate()
+        else:
+            self.store.extras.setdefault(self.name,{})[key] = value
+
+    def __contains__(self,key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return ['date'] + list(self.store.metrics) + list(self.store.extras.get(self.name,{}).keys())
+
+    def items(self):
+        return [(key,self[key]) for key in self.keys()]
+
+    def get(self,key,default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+#=============================================================================================
+# Case store class
+#=============================================================================================
+
+class CaseStore:
+
+    def __init__(self,metrics=None,regions=None,dates=None,population=None,negative_daily=True):
+        """
+        Initialize an empty CaseStore.
+
+        Parameters:
+        ----------------------
+        metrics
+            List of metric names to provide. Raw metrics are always stored. Default is every
+            metric in METRIC_DTYPES.
+        regions
+            List of region names to create rows for. Default is None.
+        dates
+            List of datetime objects to create columns for. Default is None.
+        population
+            Dict of {region: population} used for confirmed_normalized. Regions without
+            population data have a normalized count of zero.
+        negative_daily
+            If False, negative daily changes are clipped to zero. Default is True.
+
+        Returns:
+        ----------------------
+        Instance of a CaseStore object
+        """
+
+        if metrics is None: metrics = list(METRIC_DTYPES.keys())
+        self.metrics = RAW_METRICS + [metric for metric in metrics if metric not in RAW_METRICS]
+
+        #Region index
+        self.regions = []
+        self.index = {}
+        self.extras = {}
+
+        #Options used by derived metrics
+        self._population = dict(population) if population is not None else {}
+        self._negative_daily = negative_daily
+        self.daily_masks = []
+
+        #Storage arrays for raw metrics, allocated with spare capacity along both axes
+        self.n_regions = 0
+        self.n_dates = 0
+        self._capacity = (0,0)
+        self._dates = np.zeros(0,dtype='datetime64[D]')
+        self._data = {}
+        for metric in RAW_METRICS:
+            self._data[metric] = np.zeros((0,0),dtype=METRIC_DTYPES[metric])
+        self._date_list = None
+
+        #Memoized derived metrics, and the number of leading date columns that are up to date
+        self._derived = {}
+        self._valid = {}
+
+        if regions is not None: self.add_regions(regions)
+        if dates is not None: self.append_dates(dates)
+
+    #-----------------------------------------------------------------------------------------
+    # Construction
+    #-----------------------------------------------------------------------------------------
+
+    def _reserve(self,n_regions,n_dates):
+        """
+        Ensures storage arrays can hold at least n_regions rows and n_dates columns,
+        doubling the capacity of an axis whenever it needs to grow.
+        """
+
+        rows, cols = self._capacity
+        if n_regions <= rows and n_dates <= cols: return
+
+        new_rows = rows if n_regions <= rows else max(n_regions,rows*2,8)
+        new_cols = cols if n_dates <= cols else max(n_dates,cols*2,8)
+        for storage in [self._data,self._derived]:
+            for metric in storage.keys():
+                old = storage[metric]
+                new = np.zeros((new_rows,new_cols),dtype=old.dtype)
+                new[:self.n_regions,:self.n_dates] = old[:self.n_regions,:self.n_dates]
+                storage[metric] = new
+
+        new_dates = np.zeros(new_cols,dtype='datetime64[D]')
+        new_dates[:self.n_dates] = self._dates[:self.n_dates]
+        self._dates = new_dates
+        self._capacity = (new_rows,new_cols)
+
+    def _ensure_writable(self):
+        """
+        Replaces read-only metric arrays (memory-mapped, or views of another store) with
+        in-memory copies before they are modified.
+        """
+
+        for storage in [self._data,self._derived]:
+            for metric in storage.keys():
+                if storage[metric].flags.writeable == False:
+                    storage[metric] = np.array(storage[metric])
+
+    def add_region(self,name):
+        """
+        Adds a region if it doesn't exist yet. Returns the row index of the region.
+        """
+
+        if name in self.index: return self.index[name]
+        self._reserve(self.n_regions+1,self.n_dates)
+        self.index[name] = self.n_regions
+        self.regions.append(name)
+        self.n_regions += 1
+        self.invalidate()
+        return self.index[name]
+
+    def add_regions(self,names):
+        """
+        Adds multiple regions. Returns an array of their row indices.
+        """
+
+        return np.array([self.add_region(name) for name in names],dtype=np.intp)
+
+    def append_dates(self,dates):
+        """
+        Appends columns for the passed dates, filled with zeros. Returns the column index
+        of the first appended date.
+        """
+
+        start = self.n_dates
+        dates = np.array(dates,dtype='datetime64[D]')
+        self._reserve(self.n_regions,self.n_dates+len(dates))
+        self._dates[start:start+len(dates)] = dates
+        self.n_dates += len(dates)
+        self._date_list = None
+        self.invalidate(start)
+        return start
+
+    def truncate(self,date):
+        """
+        Removes the passed date and every later date, so they can be read again (e.g., after
+        reports were revised). Returns the number of dates removed.
+        """
+
+        start = int(np.searchsorted(self.dates,np.datetime64(date,'D')))
+        removed = self.n_dates - start
+        if removed <= 0: return 0
+
+        #Clear removed columns, as appended dates are expected to start from zero
+        self._ensure_writable()
+        for metric in RAW_METRICS:
+            self._data[metric][:,start:self.n_dates] = 0
+        self.n_dates = start
+        self._date_list = None
+        self.invalidate(start)
+        return removed
+
+    def add_values(self,metric,rows,col,values):
+        """
+        Adds values to a raw metric for the passed rows in a single date column, and
+        invalidates derived metrics from that column onward.
+        """
+
+        self._ensure_writable()
+        self._data[metric][rows,col] += values
+        self.invalidate(col)
+
+    def set_values(self,metric,rows,cols,values):
+        """
+        Overwrites individual values of a raw metric at the passed (row, column) pairs, and
+        invalidates derived metrics from the earliest column onward.
+        """
+
+        cols = np.asarray(cols)
+        if len(cols) == 0: return
+        self._ensure_writable()
+        self._data[metric][rows,cols] = values
+        self.invalidate(int(cols.min()))
+
+    def mask_daily(self,name,date):
+        """
+        Sets daily changes for a region on the passed date to NaN (e.g., for dates where
+        the reporting methodology changed).
+        """
+
+        mask = (name,np.datetime64(date,'D'))
+        if mask in self.daily_masks: return
+        self.daily_masks.append(mask)
+        self.invalidate()
+
+    #-----------------------------------------------------------------------------------------
+    # Derived metrics
+    #-----------------------------------------------------------------------------------------
+
+    @property
+    def population(self):
+        """
+        Dict of {region: population} used for confirmed_normalized. Assigning a different dict
+        marks confirmed_normalized as out of date.
+        """
+
+        return self._population
+
+    @population.setter
+    def population(self,population):
+        population = dict(population) if population is not None else {}
+        if population != self._population: self.invalidate(metrics=['confirmed_normalized'])
+        self._population = population
+
+    @property
+    def negative_daily(self):
+        """
+        If False, negative daily changes are clipped to zero. Changing this setting marks
+        daily and daily_deaths as out of date.
+        """
+
+        return self._negative_daily
+
+    @negative_daily.setter
+    def negative_daily(self,negative_daily):
+        if negative_daily != self._negative_daily: self.invalidate(metrics=['daily','daily_deaths'])
+        self._negative_daily = negative_daily
+
+    def invalidate(self,start=0,metrics=None):
+        """
+        Marks derived metrics as out of date from the passed date column onward. If a list of
+        metrics is passed, only those metrics are marked.
+        """
+
+        for metric in self._valid.keys():
+            if metrics is not None and metric not in metrics: continue
+            self._valid[metric] = min(self._valid[metric],start)
+
+    def _compute(self,metric):
+        """
+        Computes a derived metric for any date columns that are out of date.
+        """
+
+        if metric not in self._derived:
+            self._derived[metric] = np.zeros(self._capacity,dtype=METRIC_DTYPES.get(metric,np.float32))
+            self._valid[metric] = 0
+        start = self._valid[metric]
+        end = self.n_dates
+        if start >= end: return
+
+        #Copy read-only derived arrays (e.g., views of another store) before writing to them
+        if self._derived[metric].flags.writeable == False:
+            self._derived[metric] = np.array(self._derived[metric])
+        out = self._derived[metric][:self.n_regions,start:end]
+
+        #Ongoing cases
+        if metric == 'active':
+            confirmed, deaths, recovered = [self._data[raw][:self.n_regions,start:end] for raw in RAW_METRICS]
+            out[:] = confirmed - recovered - deaths
+
+        #Case count per 100,000 people
+        elif metric == 'confirmed_normalized':
+            population = np.array([self.population.get(name,np.nan) for name in self.regions],dtype=np.float64)
+            normalized = (self._data['confirmed'][:self.n_regions,start:end] / population[:,None]) * 100000
+            normalized[np.isnan(population)] = 0.0
+            out[:] = normalized
+
+        #Daily changes in confirmed cases and deaths
+        elif metric in ['daily','daily_deaths']:
+            raw = self._data['confirmed' if metric == 'daily' else 'deaths'][:self.n_regions,:end]
+            daily = np.diff(raw[:,max(start-1,0):].astype(np.float64),axis=1)
+            if start == 0: daily = np.concatenate([np.full((self.n_regions,1),np.nan),daily],axis=1)
+            if self.negative_daily == False: daily = np.maximum(daily,0)
+            out[:] = daily
+            for name, date in self.daily_masks:
+                col = int(np.searchsorted(self.dates,date))
+                if name in self.index and start <= col < end and self.dates[col] == date:
+                    out[self.index[name],col-start] = np.nan
+
+        else:
+            raise KeyError(metric)
+
+        self._valid[metric] = end
+
+    #-----------------------------------------------------------------------------------------
+    # Access
+    #-----------------------------------------------------------------------------------------
+
+    @property
+    def dates(self):
+        """
+        Date axis as a datetime64[D] array.
+        """
+
+        return self._dates[:self.n_dates]
+
+    @property
+    def date_list(self):
+        """
+        Date axis as a list of datetime objects, matching the original "date" entry.
+        """
+
+        if self._date_list is None:
+            self._date_list = self.dates.astype('datetime64[us]').tolist()
+        return self._date_list
+
+    def date_index(self,date):
+        """
+        Returns the column index of the passed date.
+        """
+
+        date = np.datetime64(date,'D')
+        idx = int(np.searchsorted(self.dates,date))
+        if idx >= self.n_dates or self.dates[idx] != date:
+            raise ValueError(f"{date} is not in the date axis")
+        return idx
+
+    def values(self,metric,start=None,end=None):
+        """
+        Returns a regions x dates view of a metric, optionally limited to a date range.
+        Start and end dates are inclusive, and may be datetime objects or column indices.
+        Derived metrics are computed on first access.
+        """
+
+        start = 0 if start is None else (start if isinstance(start,(int,np.integer)) else self.date_index(start))
+        end = self.n_dates if end is None else (end+1 if isinstance(end,(int,np.integer)) else self.date_index(end)+1)
+        if metric in self._data: return self._data[metric][:self.n_regions,start:end]
+        if metric not in self.metrics: raise KeyError(metric)
+        self._compute(metric)
+        return self._derived[metric][:self.n_regions,start:end]
+
+    def series(self,region,metric,start=None,end=None):
+        """
+        Returns a view of a single region's time series for the passed metric.
+        """
+
+        return self.values(metric,start,end)[self.index[region]]
+
+    def rows(self,names):
+        """
+        Returns an array of row indices for the passed region names.
+        """
+
+        return np.array([self.index[name] for name in names],dtype=np.intp)
+
+    def slice(self,start=None,end=None):
+        """
+        Returns a new CaseStore covering a date range. Metric arrays in the returned store
+        are read-only views of this store's arrays, so no data is copied; they are copied if
+        the slice modifies or recomputes them, so this store is never changed through a slice.
+        Derived metrics are computed over the full date range first, so daily changes at the
+        start of the range are kept unless the slice recomputes them.
+        """
+
+        start = 0 if start is None else self.date_index(start)
+        end = self.n_dates if end is None else self.date_index(end)+1
+
+        other = CaseStore(metrics=self.metrics,population=self.population,negative_daily=self.negative_daily)
+        other.regions = list(self.regions)
+        other.index = dict(self.index)
+        other.extras = self.extras
+        other.daily_masks = list(self.daily_masks)
+        other.n_regions = self.n_regions
+        other.n_dates = end - start
+        other._capacity = (self.n_regions,end-start)
+        other._dates = self._dates[start:end]
+        for metric in RAW_METRICS:
+            other._data[metric] = self._data[metric][:self.n_regions,start:end]
+            other._data[metric].flags.writeable = False
+        for metric in [metric for metric in self.metrics if metric in DERIVED_METRICS]:
+            self._compute(metric)
+            other._derived[metric] = self._derived[metric][:self.n_regions,start:end]
+            other._derived[metric].flags.writeable = False
+            other._valid[metric] = end - start
+        return other
+
+    def copy(self):
+        """
+        Returns an independent copy of the store. Raw metric arrays are copied; derived
+        metrics are recomputed on access.
+        """
+
+        other = CaseStore(metrics=self.metrics,population=self.population,negative_daily=self.negative_daily)
+        other.regions = list(self.regions)
+        other.index = dict(self.index)
+        other.extras = {name:dict(extras) for name,extras in self.extras.items()}
+        other.daily_masks = list(self.daily_masks)
+        other.n_regions = self.n_regions
+        other.n_dates = self.n_dates
+        other._capacity = (self.n_regions,self.n_dates)
+        other._dates = self.dates.copy()
+        for metric in RAW_METRICS:
+            other._data[metric] = np.array(self.values(metric))
+        return other
+
+    @property
+    def nbytes(self):
+        """
+        Total number of bytes held by the metric arrays.
+        """
+
+        return sum([arr.nbytes for arr in list(self._data.values()) + list(self._derived.values())])
+
+    #-----------------------------------------------------------------------------------------
+    # Dict-style access
+    #-----------------------------------------------------------------------------------------
+
+    def __getitem__(self,name):
+        if name not in self.index: raise KeyError(name)
+        return RegionView(self,name)
+
+    def __contains__(self,name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(list(self.regions))
+
+    def __len__(self):
+        return self.n_regions
+
+    def keys(self):
+        return list(self.regions)
+
+    def items(self):
+        return [(name,self[name]) for name in self.regions]
+
+    def __delitem__(self,name):
+        """
+        Removes a region, shifting the rows below it up by one.
+        """
+
+        self._ensure_writable()
+        row = self.index.pop(name)
+        for metric in RAW_METRICS:
+            arr = self._data[metric]
+            arr[row:self.n_regions-1] = arr[row+1:self.n_regions]
+            arr[self.n_regions-1] = 0
+        del self.regions[row]
+        if name in self.extras: del self.extras[name]
+        self.n_regions -= 1
+        for i in range(row,self.n_regions):
+            self.index[self.regions[i]] = i
+        self.invalidate()
+
+    def update(self,other):
+        """
+        Adds or replaces regions using another CaseStore, aligned on common dates. Dates
+        missing from the other store are left as zero.
+        """
+
+        self._ensure_writable()
+        _, idx_self, idx_other = np.intersect1d(self.dates,other.dates,return_indices=True)
+        for metric in other.metrics:
+            if metric not in self.metrics: self.metrics.append(metric)
+
+        for name in other.keys():
+            row = self.add_region(name)
+            other_row = other.index[name]
+            for metric in RAW_METRICS:
+                self._data[metric][row,:self.n_dates] = 0
+                self._data[metric][row,idx_self] = other._data[metric][other_row,idx_other]
+            if name in other.extras: self.extras[name] = dict(other.extras[name])
+            if name in other.population: self.population[name] = other.population[name]
+        self.daily_masks += [mask for mask in other.daily_masks if mask not in self.daily_masks]
+        self.invalidate()
+
+    #-----------------------------------------------------------------------------------------
+    # Conversion
+    #-----------------------------------------------------------------------------------------
+
+    def to_dict(self):
+        """
+        Converts the store to the original dict-of-lists structure.
+        """
+
+        cases = {}
+        for name in self.regions:
+            cases[name] = {'date':self.date_list}
+            for metric in self.metrics:
+                cases[name][metric] = self.series(name,metric).tolist()
+            cases[name].update(self.extras.get(name,{}))
+        return cases
+
+    @classmethod
+    def from_dict(cls,cases,dates,population=None,negative_daily=True):
+        """
+        Creates a store from the original dict-of-lists structure. Only raw metrics are
+        read; derived metrics are recomputed on access.
+        """
+
+        metrics = []
+        for name in cases.keys():
+            metrics = [key for key in cases[name].keys() if key != 'date' and isinstance(cases[name][key],list)]
+            break
+
+        store = cls(metrics=metrics,regions=list(cases.keys()),dates=dates,
+                    population=population,negative_daily=negative_daily)
+        for name in cases.keys():
+            for key in cases[name].keys():
+                if key == 'date' or key in DERIVED_METRICS: continue
+                if key in RAW_METRICS:
+                    store.series(name,key)[:] = np.asarray(cases[name][key])
+                else:
+                    store.extras.setdefault(name,{})[key] = cases[name][key]
+        store.invalidate()
+        return store
+
+    #-----------------------------------------------------------------------------------------
+    # Snapshots
+    #-----------------------------------------------------------------------------------------
+
+    def save(self,path):
+        """
+        Writes the store to a snapshot directory, containing one "<metric>.npy" file per raw
+        metric and an "index.json" file holding regions, dates and options. Files are written
+        to temporary names first and then moved into place, with the index written last.
+        """
+
+        os.makedirs(path,exist_ok=True)
+        for metric in RAW_METRICS:
+            fpath = os.path.join(path,f'{metric}.npy')
+            with open(fpath+'.tmp','wb') as f:
+                np.save(f,np.ascontiguousarray(self.values(metric)))
+            os.replace(fpath+'.tmp',fpath)
+
+        index = {
+            'metrics':list(self.metrics),
+            'regions':list(self.regions),
+            'dates':[str(date) for date in self.dates],
+            'population':{name:float(value) for name,value in self.population.items()},
+            'negative_daily':bool(self.negative_daily),
+            'daily_masks':[[name,str(date)] for name,date in self.daily_masks],
+            'extras':self.extras,
+        }
+        fpath = os.path.join(path,'index.json')
+        with open(fpath+'.tmp','w') as f:
+            json.dump(index,f)
+        os.replace(fpath+'.tmp',fpath)
+
+    @classmethod
+    def load(cls,path,mmap_mode='r'):
+        """
+        Opens a snapshot directory written by save().
+
+        Parameters:
+        ----------------------
+        path
+            Path of the snapshot directory.
+        mmap_mode
+            Memory-map mode passed to np.load (default is "r"). Arrays are only read from disk
+            as they are accessed; they are copied into memory if the store is modified.
+            Set to None to read the arrays into memory immediately.
+
+        Returns:
+        ----------------------
+        Instance of a CaseStore object
+        """
+
+        with open(os.path.join(path,'index.json'),'r') as f:
+            index = json.load(f)
+
+        store = cls(metrics=index['metrics'],population=index['population'],negative_daily=index['negative_daily'])
+        store.regions = list(index['regions'])
+        store.index = {name:i for i,name in enumerate(store.regions)}
+        store.extras = index['extras']
+        store.daily_masks = [(name,np.datetime64(date,'D')) for name,date in index['daily_masks']]
+        store.n_regions = len(store.regions)
+        store._dates = np.array(index['dates'],dtype='datetime64[D]')
+        store.n_dates = len(store._dates)
+        store._capacity = (store.n_regions,store.n_dates)
+        for metric in RAW_METRICS:
+            store._data[metric] = np.load(os.path.join(path,f'{metric}.npy'),mmap_mode=mmap_mode)
+        return store
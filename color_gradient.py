@@ -65,6 +65,19 @@ class Gradient:
         if error == 3: raise RuntimeError('The first element must be a hex string or an rgb tuple, e.g., [["#00FFFF",25.0]')
         if error == 4: raise RuntimeError('Values assigned to the gradient must be continuous, either increasing or decreasing.')
         
+        #Precompute start & end values and RGB colors of each range
+        self.start_values = np.array([arg[0][1] for arg in args],dtype=np.float64)
+        self.end_values = np.array([arg[1][1] for arg in args],dtype=np.float64)
+        self.start_rgb = np.array([self.to_rgb(arg[0][0]) for arg in args],dtype=np.float64)
+        self.end_rgb = np.array([self.to_rgb(arg[1][0]) for arg in args],dtype=np.float64)
+        
+    #Returns the rgb tuple corresponding to the passed hex string or rgb tuple
+    def to_rgb(self,color):
+        if isinstance(color,str):
+            color = color.lstrip('#')
+            return tuple(int(color[i:i+2], 16) for i in (0, 2 ,4))
+        return tuple(color)
+        
     #Returns the hex string corresponding to the passed rgb values
     def rgb(self,r,g,b):
         r = int(r)
@@ -101,60 +114,67 @@ class Gradient:
         for ival in arr[::-1]:
             if ival <= val:
                 return arr.index(ival)
+    
+    #Returns an array of rgb values (0-255) for an array of levels, with the same colors as get_cmap()
+    def get_rgb(self,levels):
+        
+        levels = np.asarray(levels,dtype=np.float64).ravel()
+        thres_min = np.array(self.thres_min,dtype=np.float64)
+        
+        #Find closest lower threshold, using the first range starting at that threshold
+        below = thres_min[None,:] <= levels[:,None]
+        last = len(thres_min) - 1 - np.argmax(below[:,::-1],axis=1)
+        idx = np.argmax(thres_min[None,:] == thres_min[last][:,None],axis=1)
+        
+        #Interpolate between start & end colors of each range
+        rng = self.end_values[idx] - self.start_values[idx]
+        position = levels - self.start_values[idx]
+        col1 = self.end_rgb[idx]
+        col2 = self.start_rgb[idx]
+        with np.errstate(divide='ignore',invalid='ignore'):
+            rgb = col2 + (-1.0 * position[:,None] * ((col2 - col1) / rng[:,None]))
+        rgb[rng == 0] = col2[rng == 0]
+        
+        #Use start & end colors for levels outside of range
+        rgb[(levels < self.thres[0]) | np.isnan(levels)] = self.start_rgb[0]
+        rgb[levels > self.thres[-1]] = self.end_rgb[-1]
+        return rgb.astype(int)
         
     #Create a color map based on passed levels
     def get_cmap(self,levels):
         
-        #Add empty color list
-        self.colors = []
+        levels = np.asarray(levels,dtype=np.float64).ravel()
         
-        #Iterate through levels
-        for lev_idx,lev in enumerate(levels):
-            
-            #Check if level is outside of range
-            if lev < self.thres[0]:
-                start_hex = self.args[0][0][0]
-                if "#" not in start_hex: start_hex = self.rgb(start_hex[0],start_hex[1],start_hex[2])
-                self.colors.append(start_hex)
-            
-            elif lev > self.thres[-1]:
-                end_hex = self.args[-1][1][0]
-                if "#" not in end_hex: end_hex = self.rgb(end_hex[0],end_hex[1],end_hex[2])
-                self.colors.append(end_hex)
-                
-            else:
-                
-                #Find closest lower threshold
-                idx = self.find_nearest(self.thres_min,lev)
-                
-                #Retrieve start & end values
-                start_value = self.args[idx][0][1]
-                end_value = self.args[idx][1][1]
-                
-                #Calculate start and end RGB tuples, if passed as hex
-                start_hex = self.args[idx][1][0]
-                end_hex = self.args[idx][0][0]
-                if "#" in start_hex:
-                    start_hex = start_hex.lstrip('#')
-                    end_hex = end_hex.lstrip('#')
-                    start_rgb = tuple(int(start_hex[i:i+2], 16) for i in (0, 2 ,4))
-                    end_rgb = tuple(int(end_hex[i:i+2], 16) for i in (0, 2 ,4))
-                else:
-                    start_rgb = start_hex
-                    end_rgb = end_hex
-    
-                #Get hex value for the color at this point in the range
-                nrange_color = (end_value - start_value)
-                idx = lev - start_value
-                hex_val = self.getColor(idx,nrange_color,start_rgb,end_rgb)
-                
-                #Append color to list
-                self.colors.append(hex_val)
+        #Format colors as hex strings
+        hex_codes = np.array(['%02x' % i for i in range(256)])[np.clip(self.get_rgb(levels),0,255)]
+        colors = np.char.add(np.char.add(np.char.add('#',hex_codes[:,0]),hex_codes[:,1]),hex_codes[:,2]).astype(object)
+        
+        #Use the passed start & end colors for levels outside of range
+        start_hex = self.args[0][0][0]
+        if "#" not in start_hex: start_hex = self.rgb(start_hex[0],start_hex[1],start_hex[2])
+        end_hex = self.args[-1][1][0]
+        if "#" not in end_hex: end_hex = self.rgb(end_hex[0],end_hex[1],end_hex[2])
+        colors[levels < self.thres[0]] = start_hex
+        colors[levels > self.thres[-1]] = end_hex
+        self.colors = colors.tolist()
         
         #Convert to a colormap and return
         self.cmap = col.ListedColormap(self.colors)
         return self.cmap
     
+    #Create a colormap with a fixed number of colors, evenly spaced between vmin and vmax. Unlike
+    #get_cmap(), its size does not depend on the range of the data. Values below vmin and above vmax
+    #use the gradient's start & end colors. The matching normalization is stored in self.norm.
+    def get_lut(self,vmin,vmax,n=256):
+        
+        rgb = self.get_rgb(np.linspace(vmin,vmax,n)) / 255.0
+        self.colors = [col.to_hex(color) for color in rgb]
+        self.cmap = col.ListedColormap(rgb)
+        self.cmap.set_under(np.array(self.start_rgb[0]) / 255.0)
+        self.cmap.set_over(np.array(self.end_rgb[-1]) / 255.0)
+        self.norm = col.Normalize(vmin=vmin,vmax=vmax)
+        return self.cmap
+    
     def get_colors(self,levels):
         
         try:
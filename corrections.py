@@ -0,0 +1,98 @@
+"""
+Data corrections
+This module applies manual corrections to case data, for dates where the CSSE daily reports
+are known to be inaccurate (e.g., due to server maintenance). Corrections are listed in
+"data/corrections.csv" with one row per region, date and metric, and are applied to a
+CaseStore in a single indexed write after all reports have been aggregated.
+"""
+
+import numpy as np
+import pandas as pd
+
+#Default path of the corrections table
+CORRECTIONS_PATH = 'data/corrections.csv'
+
+def load_corrections(scope,path=CORRECTIONS_PATH):
+    """
+    Reads the corrections table for the passed scope.
+
+    Parameters:
+    ----------------------
+    scope
+        String denoting the dataset to read corrections for ("us" or "world").
+    path
+        Path of the corrections table. Each row contains the following columns:
+        scope       Dataset the correction applies to ("us" or "world").
+        source      Data source the correction applies to ("csse", "worldometers" or "any").
+        region      Lowercase region name, matching the keys of the case data.
+        date        Date of the correction (YYYY-MM-DD).
+        metric      Raw metric to correct ("confirmed", "deaths" or "recovered").
+        value       Corrected total for this region, date and metric.
+        max_change  Optional guard. If set, the correction is only applied if the reported
+                    confirmed count differs from the previous day's by less than this amount,
+                    i.e., only if the report for this date was not yet updated.
+        reference   Source of the corrected value.
+
+    Returns:
+    ----------------------
+    pandas.DataFrame of corrections for this scope
+    """
+
+    table = pd.read_csv(path,parse_dates=['date'])
+    table = table.loc[table['scope'] == scope].reset_index(drop=True)
+    table['region'] = table['region'].str.lower()
+    return table
+
+def apply_corrections(cases,table,dates,sources):
+    """
+    Applies corrections to a CaseStore in place. Only corrections for the passed dates,
+    matching the data source used for that date, and for regions present in the store are
+    applied. Guards are evaluated against the reported data before any value is replaced.
+
+    Parameters:
+    ----------------------
+    cases
+        CaseStore instance to correct.
+    table
+        DataFrame of corrections, as returned by load_corrections.
+    dates
+        List of datetime objects that were read into the store.
+    sources
+        List of data source names ("csse" or "worldometers") for each of the passed dates.
+
+    Returns:
+    ----------------------
+    Number of values corrected
+    """
+
+    #Select applicable corrections
+    source_of = dict(zip(pd.to_datetime(dates),sources))
+    date_source = table['date'].map(source_of)
+    keep = date_source.notna() & ((table['source'] == 'any') | (table['source'] == date_source))
+    keep &= table['region'].isin(cases.index)
+    table = table.loc[keep]
+    if len(table) == 0: return 0
+
+    rows = cases.rows(table['region'])
+    cols = np.array([cases.date_index(date) for date in table['date']],dtype=np.int64)
+
+    #Evaluate guards against the reported confirmed counts
+    max_change = table['max_change'].to_numpy(dtype=np.float64)
+    guarded = np.isnan(max_change) == False
+    if guarded.any() == True:
+        confirmed = cases.values('confirmed')
+        reported = confirmed[rows[guarded],cols[guarded]].astype(np.int64)
+        previous = np.where(cols[guarded] > 0,confirmed[rows[guarded],np.maximum(cols[guarded]-1,0)],0)
+        apply = np.ones(len(table),dtype=bool)
+        apply[guarded] = np.abs(reported - previous) < max_change[guarded]
+    else:
+        apply = np.ones(len(table),dtype=bool)
+
+    #Write corrected values, one indexed write per metric
+    metrics = table['metric'].to_numpy()
+    values = table['value'].to_numpy()
+    for metric in np.unique(metrics):
+        select = apply & (metrics == metric)
+        if select.any() == True: cases.set_values(metric,rows[select],cols[select],values[select])
+
+    return int(apply.sum())
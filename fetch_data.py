@@ -0,0 +1,314 @@
+"""
+Daily report fetcher
+This module downloads Johns Hopkins CSSE daily report CSV files concurrently over a
+pooled keep-alive session. Each report is downloaded exactly once and returned as raw
+bytes, which can be handed directly to the CSV parser. Downloaded reports are kept in
+an on-disk cache, so past reports are read from disk instead of the network.
+"""
+
+import os
+import json
+import hashlib
+import itertools
+import collections
+import datetime as dt
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+
+#Base URL of the CSSE daily report directory
+CSSE_URL = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports'
+
+#First date with a CSSE daily report
+FIRST_REPORT_DATE = dt.datetime(2020,1,22)
+
+#Reports for dates within this many days of today are revalidated against the server
+REVALIDATE_DAYS = 3
+
+#=============================================================================================
+# Report cache class
+#=============================================================================================
+
+class ReportCache:
+    
+    def __init__(self,directory='cache',max_bytes=512*1024**2,revalidate_days=REVALIDATE_DAYS):
+        """
+        Initialize an on-disk cache of daily report files. Each report is stored as raw bytes
+        under "directory/source/YYYYMMDD.csv", along with a JSON file holding its ETag and
+        Last-Modified headers.
+        
+        Parameters:
+        ----------------------
+        directory
+            Directory to store cached reports in (default is "cache").
+        max_bytes
+            Maximum total size of cached reports. Least recently used reports are evicted
+            once this size is exceeded (default is 512 MB).
+        revalidate_days
+            Reports for dates within this many days of today are revalidated against the
+            server with a conditional request; older reports are served from disk without
+            any network access (default is 3).
+            
+        Returns:
+        ----------------------
+        Instance of a ReportCache object
+        """
+        
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_days = revalidate_days
+    
+    def path(self,source,date):
+        """
+        Returns the path of the cached report for the passed source and date.
+        """
+        
+        return os.path.join(self.directory,source,f"{date.strftime('%Y%m%d')}.csv")
+    
+    def get(self,source,date):
+        """
+        Returns the cached report as a (content, metadata) tuple, or (None, None) if the
+        report is not cached. Reports recorded as missing are returned as (None, metadata).
+        """
+        
+        path = self.path(source,date)
+        try:
+            with open(path+'.json','r') as f:
+                meta = json.load(f)
+            if meta.get('missing') == True: return None, meta
+            with open(path,'rb') as f:
+                content = f.read()
+        except (OSError,ValueError):
+            return None, None
+        
+        #Mark as recently used for eviction
+        self.touch(source,date)
+        return content, meta
+    
+    def put(self,source,date,content,etag=None,last_modified=None):
+        """
+        Stores a report along with its ETag and Last-Modified headers.
+        """
+        
+        path = self.path(source,date)
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        
+        #Write to temporary files first so an interrupted write never leaves a partial report
+        with open(path+'.tmp','wb') as f:
+            f.write(content)
+        with open(path+'.json.tmp','w') as f:
+            json.dump({'etag':etag,'last_modified':last_modified},f)
+        os.replace(path+'.tmp',path)
+        os.replace(path+'.json.tmp',path+'.json')
+    
+    def put_missing(self,source,date):
+        """
+        Records that no report exists for this date, so it is not requested again.
+        """
+        
+        path = self.path(source,date)
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path+'.json','w') as f:
+            json.dump({'missing':True},f)
+    
+    def touch(self,source,date):
+        """
+        Updates the modification time of a cached report, marking it as recently used.
+        """
+        
+        try:
+            os.utime(self.path(source,date))
+        except OSError:
+            pass
+    
+    def is_final(self,date):
+        """
+        Returns True if the report for this date is old enough to be served from disk
+        without revalidation.
+        """
+        
+        return date < dt.datetime.today() - dt.timedelta(days=self.revalidate_days)
+    
+    def evict(self):
+        """
+        Deletes the least recently used reports until the cache is under its size limit.
+        """
+        
+        #Collect all cached reports
+        entries = []
+        total = 0
+        if os.path.isdir(self.directory) == False: return
+        for source in os.scandir(self.directory):
+            if source.is_dir() == False: continue
+            for entry in os.scandir(source.path):
+                if entry.name.endswith('.csv') == False: continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime,stat.st_size,entry.path))
+                total += stat.st_size
+        
+        #Remove oldest entries first
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            for fname in [path,path+'.json']:
+                try:
+                    os.remove(fname)
+                except OSError:
+                    pass
+            total -= size
+
+#=============================================================================================
+# Fetch functions
+#=============================================================================================
+
+def report_url(date,base_url=CSSE_URL):
+    """
+    Returns the URL of the CSSE daily report for the passed date.
+    """
+
+    return f"{base_url}/{date.strftime('%m-%d-%Y')}.csv"
+
+def create_session(workers=8,retries=3):
+    """
+    Creates a requests session whose connection pool is large enough to keep one
+    keep-alive connection open per worker thread.
+
+    Parameters:
+    ----------------------
+    workers
+        Number of concurrent requests the session will be used for (default is 8).
+    retries
+        Number of retries for connection errors and 5xx responses (default is 3).
+
+    Returns:
+    ----------------------
+    requests.Session instance
+    """
+
+    retry = Retry(total=retries,backoff_factor=0.5,status_forcelist=[500,502,503,504])
+    adapter = HTTPAdapter(pool_connections=1,pool_maxsize=max(workers,1),max_retries=retry)
+    session = requests.Session()
+    session.mount('http://',adapter)
+    session.mount('https://',adapter)
+    return session
+
+def cache_source(base_url):
+    """
+    Returns the name of the cache subdirectory used for reports from the passed base URL.
+    """
+
+    if base_url == CSSE_URL: return 'csse'
+    return 'csse_' + hashlib.sha1(base_url.encode('utf-8')).hexdigest()[:10]
+
+def fetch_report(session,url,timeout=30):
+    """
+    Downloads a single report. Returns the raw bytes of the file, or None if the report
+    is not available (e.g., today's report has not been posted yet).
+    """
+
+    response = session.get(url,timeout=timeout)
+    if response.status_code != 200: return None
+    return response.content
+
+def fetch_cached_report(session,cache,source,date,url,timeout=30):
+    """
+    Returns a single report, using the on-disk cache where possible. Cached reports for
+    past dates are returned without network access; recent cached reports are revalidated
+    with a conditional request, and new reports are downloaded and stored in the cache.
+    """
+
+    #Serve finalized reports straight from disk
+    content, meta = cache.get(source,date)
+    if cache.is_final(date) == True:
+        if content is not None: return content
+        if meta is not None and meta.get('missing') == True: return None
+
+    #Otherwise revalidate against the server
+    headers = {}
+    if content is not None:
+        if meta.get('etag') is not None: headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified') is not None: headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        response = session.get(url,headers=headers,timeout=timeout)
+    except requests.RequestException:
+        if content is not None: return content
+        raise
+
+    #Cached copy is still current
+    if response.status_code == 304 and content is not None: return content
+
+    #Store new or updated report
+    if response.status_code == 200:
+        cache.put(source,date,response.content,
+                  etag=response.headers.get('ETag'),last_modified=response.headers.get('Last-Modified'))
+        return response.content
+
+    #Remember old dates that have no report
+    if response.status_code == 404 and content is None and cache.is_final(date) == True:
+        cache.put_missing(source,date)
+
+    return content
+
+def iter_reports(dates,workers=8,base_url=CSSE_URL,session=None,cache=None):
+    """
+    Downloads the daily reports for the passed dates with a pool of worker threads and
+    yields them back in date order. At most 2*workers downloads are in flight at any time,
+    so memory use does not grow with the number of dates requested.
+
+    Parameters:
+    ----------------------
+    dates
+        Iterable of datetime objects in the order they should be yielded.
+    workers
+        Number of concurrent requests (default is 8).
+    base_url
+        URL of the directory holding the daily reports. Defaults to the CSSE GitHub repository,
+        but can point to any HTTP server serving files named "MM-DD-YYYY.csv".
+    session
+        requests.Session to use. If none is passed, a pooled session is created.
+    cache
+        ReportCache instance to read and store reports in. If None, reports are always downloaded.
+
+    Returns:
+    ----------------------
+    Generator of (date, content) tuples, where content is the raw bytes of the report or None
+    """
+
+    if session is None: session = create_session(workers)
+    workers = max(int(workers),1)
+    source = cache_source(base_url)
+
+    #Download with or without the on-disk cache
+    def fetch(date):
+        if cache is None: return fetch_report(session,report_url(date,base_url))
+        return fetch_cached_report(session,cache,source,date,report_url(date,base_url))
+
+    dates = iter(dates)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        #Fill the download window
+        pending = collections.deque()
+        for date in itertools.islice(dates,workers*2):
+            pending.append((date,executor.submit(fetch,date)))
+
+        #Yield reports in order, topping up the window as each one completes
+        while len(pending) > 0:
+            date, future = pending.popleft()
+            next_date = next(dates,None)
+            if next_date is not None:
+                pending.append((next_date,executor.submit(fetch,next_date)))
+            yield date, future.result()
+
+    #Keep the cache within its size limit
+    if cache is not None: cache.evict()
+
+def fetch_reports(dates,workers=8,base_url=CSSE_URL,session=None,cache=None):
+    """
+    Downloads the daily reports for the passed dates concurrently. Returns a dict of
+    {date: content} containing only the reports that are available.
+    """
+
+    reports = {}
+    for date, content in iter_reports(dates,workers=workers,base_url=base_url,session=session,cache=cache):
+        if content is not None: reports[date] = content
+    return reports
@@ -0,0 +1,81 @@
+"""
+Location alias resolver
+This module maps the location names used by CSSE and Worldometers reports to the region keys
+used in the case data. Aliases are listed in "data/location_aliases.csv" and loaded once into
+hash maps; resolved names are memoized, so each distinct name is only resolved once per run.
+"""
+
+import pandas as pd
+
+#Default path of the alias table
+ALIASES_PATH = 'data/location_aliases.csv'
+
+class LocationResolver:
+
+    def __init__(self,scope,source,path=ALIASES_PATH):
+        """
+        Initialize a resolver of location names for one dataset and data source.
+
+        Parameters:
+        ----------------------
+        scope
+            String denoting the dataset ("us" or "world").
+        source
+            String denoting the data source ("csse" or "worldometers"). Aliases listed with
+            a source of "any" apply to both.
+        path
+            Path of the alias table. Each row contains the following columns:
+            scope   Dataset the alias applies to ("us" or "world").
+            source  Data source the alias applies to ("csse", "worldometers" or "any").
+            match   How the alias is matched against a location name:
+                    "contains"  name contains the alias (e.g., "Diamond Princess").
+                    "exact"     name equals the alias.
+                    "suffix"    the text following the first comma in the name, with spaces
+                                removed, equals the alias (e.g., "King County, WA"). Names with
+                                a comma that match no suffix alias are discarded.
+            alias   Location name as written in the source data.
+            region  Lowercase region key the name resolves to.
+
+        Returns:
+        ----------------------
+        Instance of a LocationResolver object
+        """
+
+        table = pd.read_csv(path,dtype=str,keep_default_na=False)
+        table = table.loc[(table['scope'] == scope) & ((table['source'] == source) | (table['source'] == 'any'))]
+
+        self.scope = scope
+        self.source = source
+        self.contains = [tuple(pair) for pair in table.loc[table['match'] == 'contains',['alias','region']].values]
+        self.exact = dict(table.loc[table['match'] == 'exact',['alias','region']].values)
+        self.suffix = dict(table.loc[table['match'] == 'suffix',['alias','region']].values)
+        self.regions = list(dict.fromkeys(table['region']))
+        self.memo = {}
+
+    def _resolve(self,name):
+        """
+        Resolves a location name that has not been seen before.
+        """
+
+        for alias, region in self.contains:
+            if alias in name: return region
+        if name in self.exact: return self.exact[name]
+        if len(self.suffix) > 0 and ',' in name:
+            return self.suffix.get(name.split(',')[1].replace(' ',''))
+        return name.lower()
+
+    def resolve(self,name):
+        """
+        Returns the region key for a location name, or None if the name should be discarded.
+        """
+
+        name = str(name)
+        if name not in self.memo: self.memo[name] = self._resolve(name)
+        return self.memo[name]
+
+    def resolve_all(self,names):
+        """
+        Returns a list of region keys for an iterable of location names.
+        """
+
+        return [self.resolve(name) for name in names]
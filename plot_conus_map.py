@@ -1,16 +1,17 @@
 #Import packages & other scripts
-import pickle
 import os, sys
 import requests
 import numpy as np
 import pandas as pd
 import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
+import matplotlib.animation as manimation
 import cartopy.crs as ccrs
-from cartopy.io.shapereader import Reader
 from cartopy.feature import ShapelyFeature
 
 import read_data
+import state_geometries
 from cartopy_wrapper import Map
 from color_gradient import Gradient
 
@@ -43,158 +44,114 @@ worldometers = True
 #Read from local file? (WARNING = ensure data sources are the same!)
 read_from_local = False
 
-#========================================================================================================
-# Get COVID-19 case data
-#========================================================================================================
-
-"""
-COVID-19 case data is retrieved from Johns Hopkins CSSE:
-https://github.com/CSSEGISandData/COVID-19
-"""
+#Number of processes to render dates with. Only used when saving images of more than one date.
+processes = 1
 
-#Avoid re-reading case data if it's already stored in memory
-try:
-    cases
-except:
-    print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
-
-    if worldometers == True: include_repatriated = False
-    if read_from_local == True:
-        cases = pickle.load(open('cases_us.pickle','rb'))
-        dates = cases['dates']
-        del cases['dates']
-    else:
-        output = read_data.read_us(worldometers=worldometers)
-        dates = output['dates']
-        cases = output['cases']
-    
-    if plot_today_only == True:
-        plot_start_date = dates[-1]
-        plot_end_date = dates[-1]
+#Whether to write an animation of all dates instead of one image per date. "path" must end in
+#".gif" (written with Pillow) or ".mp4" (written with ffmpeg). Ignored if setting==False.
+animation = {'setting': False,
+             'path': "full_file_path_here.gif",
+             'fps': 4}
 
 #========================================================================================================
 # Handle map projection & geography
 #========================================================================================================
 
+#Map projection & domain
+lon1 = -99.0
+lat1 = 35.0
+slat = 35.0
+bound_n = 50.0
+bound_s = 21.5
+bound_w = -122.0
+bound_e = -72.5
+
 #Function for returning number within range
 def return_val(start_range,end_range,start_size,end_size,val):
     frac = (val-start_range)/(end_range-start_range)
     frac = (frac * (end_size-start_size)) + start_size
     return frac
 
-#Create data colortable
-max_val = 0.0
-if plot_type == 'confirmed_normalized':
-    for key in [k for k in cases.keys() if k not in ['diamond princess','grand princess']]:
-        max_val = cases[key]['confirmed_normalized'][-1] if cases[key]['confirmed_normalized'][-1] > max_val else max_val
-    if max_val < 20: max_val = 20
-else:
-    for key in [k for k in cases.keys()]:
-        for ptype in ['confirmed','confirmed_normalized','deaths','recovered','active','daily']:
-            max_val = cases[key][ptype][-1] if cases[key][ptype][-1] > max_val else max_val
-    if max_val < 40: max_val = 40
-
-color_obj = Gradient([['#FFFF00',1.0],['#EE7B51',round(max_val*0.15)]],
-               [['#EE7B51',round(max_val*0.15)],['#B53079',round(max_val*0.6)]],
-               [['#B53079',round(max_val*0.6)],['#070092',round(max_val*1.2)]])
-
 #Create Cartopy projection
-try:
-    m
-except:
-    lon1 = -99.0
-    lat1 = 35.0
-    slat = 35.0
-    bound_n = 50.0
-    bound_s = 21.5
-    bound_w = -122.0
-    bound_e = -72.5
-    m = Map('LambertConformal',central_longitude=lon1,central_latitude=lat1,standard_parallels=[slat],res='h')
-    proj = m.proj
-
-#Read in US states shapefile
-try:
-    shp
-except:
-    fname = r'cb_2018_us_state_500k/cb_2018_us_state_500k.shp'
-    shp = Reader(fname)
+def create_map():
+    return Map('LambertConformal',central_longitude=lon1,central_latitude=lat1,standard_parallels=[slat],res='h')
+
+#Read in US states, projected & clipped to the map domain
+def read_states(m):
+    states = state_geometries.load(m.proj,[bound_w,bound_e,bound_s,bound_n])
     print("--> Read in US states shapefile")
+    return states
+
+#Create data colortable. Returns the gradient object and its maximum value.
+def create_colortable(cases):
+    max_val = 0.0
+    if plot_type == 'confirmed_normalized':
+        for key in [k for k in cases.keys() if k not in ['diamond princess','grand princess']]:
+            max_val = cases[key]['confirmed_normalized'][-1] if cases[key]['confirmed_normalized'][-1] > max_val else max_val
+        if max_val < 20: max_val = 20
+    else:
+        for key in [k for k in cases.keys()]:
+            for ptype in ['confirmed','confirmed_normalized','deaths','recovered','active','daily']:
+                max_val = cases[key][ptype][-1] if cases[key][ptype][-1] > max_val else max_val
+        if max_val < 40: max_val = 40
+
+    color_obj = Gradient([['#FFFF00',1.0],['#EE7B51',round(max_val*0.15)]],
+                   [['#EE7B51',round(max_val*0.15)],['#B53079',round(max_val*0.6)]],
+                   [['#B53079',round(max_val*0.6)],['#070092',round(max_val*1.2)]])
+    return color_obj, max_val
+
+#========================================================================================================
+# Plot data
+#========================================================================================================
+
+#Plot title for each plot type
+plot_name = {
+    'confirmed':'Confirmed Cases',
+    'confirmed_normalized':'Confirmed Cases\nPer 100,000 People',
+    'deaths':'Death Count',
+    'recovered':'Recovered Cases',
+    'active':'Active Confirmed Cases',
+    'daily':'New Daily Cases'
+}
+
+def create_frame(cases,m,states,color_obj):
+    """
+    Creates the figure, geography, state patches and labels. Returns a dict of the artists
+    that change between dates, which are filled in by update_frame().
+    """
 
-#Iterate through dates
-while plot_start_date <= plot_end_date:
-    
-    #Update on current date
-    print(f"------> Report date {plot_start_date}")
-    
     #Create figure
     fig = plt.figure(figsize=(14,9),dpi=125)
-    ax = plt.axes(projection=proj)
+    ax = plt.axes(projection=m.proj)
     ax.set_extent([bound_w,bound_e,bound_s,bound_n])
     print("--> Created matplotlib figure & map projection")
 
-    #Draw map background
+    #Draw map background & geography, which are rendered once and reused for every date
     if background_image['setting'] == True:
-        print("--> Starting to read in blue marble image")
         os.environ["CARTOPY_USER_BACKGROUNDS"] = background_image['directory_path']
-        ax.background_img(name='BM', resolution='low')
         background_image['alpha'] = 0.5
+        m.drawbase(['drawstates','drawcoastlines','drawcountries'],background={'name':'BM','resolution':'low'},ax=ax)
         print("--> Plotted blue marble image")
     else:
         background_image['alpha'] = 1.0
-
-    #Draw geography
-    m.drawstates()
-    m.drawcoastlines()
-    m.drawcountries()
+        m.drawbase(['drawstates','drawcoastlines','drawcountries'],ax=ax)
     print("--> Plotted geographic & political boundaries")
 
-    #========================================================================================================
-    # Plot data
-    #========================================================================================================
-
-    #Iterate through all states
-    total_cases = 0
-    for record, state in zip(shp.records(), shp.geometries()):
-
-        #Reference state name as a separate variable
-        name = record.attributes['NAME']
-        
-        #Get state's case data for this date
-        if name.lower() in cases.keys():
-            idx = cases[name.lower()]['date'].index(plot_start_date)
-            if plot_type not in ['confirmed','confirmed_normalized','deaths','recovered','active','daily']: plot_type = 'confirmed'
-            case_number = cases[name.lower()][plot_type][idx]
-            total_cases += case_number
-        else:
-            continue
+    #Iterate through all states with case data
+    map_states = []
+    map_paths = {}
+    labels = {}
+    for name, path, anchor in zip(states['names'],states['paths'],states['anchors']):
+        if name.lower() not in cases.keys(): continue
+        map_states.append(name)
 
         #Exclude states outside of CONUS & territories from map, but include in case count
         if name.lower() in ['alaska','hawaii','guam','puerto rico','commonwealth of the northern mariana islands',
                                                 'american samoa','united states virgin islands']: continue
-
-        #------------------------------------------------------------------------------------
-
-        #Set background state color
-        if case_number > 0:
-            cmap = color_obj.get_cmap([case_number])
-            facecolor = color_obj.colors[0]
-        else:
-            facecolor = '#eeeeee'
-
-        #Draw states
-        ax.add_geometries([state], ccrs.PlateCarree(), facecolor=facecolor, edgecolor='black', linewidth=0.5,
-                          alpha=background_image['alpha'])
-
-        #------------------------------------------------------------------------------------
-
-        #Format case number as a string
-        case_str = str(case_number)
-        if "." in case_str: case_str = '%0.1f'%(case_number)
-        if case_number == 0: case_str = " - "
+        map_paths[name] = path
 
         #Label case number using state centroid
-        centroid = state.centroid.bounds
-        lon = centroid[0]; lat = centroid[1]
+        lon = anchor[0]; lat = anchor[1]
 
         #Adjust certain states to make plotting nicer
         if name == "Louisiana": lon = lon - 0.5
@@ -216,11 +173,10 @@ while plot_start_date <= plot_end_date:
             'District of Columbia':(3.0,-3.0),
         }
         ncolor = 'k' if background_image['alpha'] == 1 else 'w'
-        if ncolor == 'k' and case_number > (max_val*0.8): ncolor = 'w'
         if name in state_transform.keys():
             transform = ccrs.PlateCarree()._as_mpl_transform(ax)
             x_tr, y_tr = state_transform.get(name)
-            ax.annotate(case_str,
+            labels[name] = ax.annotate('',
                         xy=(lon,lat), xycoords=transform,
                         xytext=(lon+x_tr,lat+y_tr), 
                         fontweight='bold', ha='center', va='center', color=ncolor, fontsize=12,
@@ -230,52 +186,211 @@ while plot_start_date <= plot_end_date:
                                         color=ncolor),
                         transform=ccrs.PlateCarree(), zorder=3)
         else:
-            ax.text(lon, lat, case_str, color='k', fontsize=12,
+            labels[name] = ax.text(lon, lat, '', color='k', fontsize=12,
                     fontweight='bold', ha='center', va='center', transform=ccrs.PlateCarree(), zorder=3)
 
+    #Draw states, colored for each date by update_frame()
+    collection = m.choropleth(map_paths,{name:np.nan for name in map_paths.keys()},empty_color='#eeeeee',ax=ax,
+                              edgecolor='black',linewidth=0.5,alpha=background_image['alpha'])
+
     #Add plot type and labels
-    plot_name = {
-        'confirmed':'Confirmed Cases',
-        'confirmed_normalized':'Confirmed Cases\nPer 100,000 People',
-        'deaths':'Death Count',
-        'recovered':'Recovered Cases',
-        'active':'Active Confirmed Cases',
-        'daily':'New Daily Cases'
-    }
     plt.title(f"CONUS States COVID-19 {plot_name.get(plot_type)}",fontweight='bold',fontsize=18,loc='left')
+    date_title = plt.title('',fontweight='bold',fontsize=14,loc='right')
+
+    #Label data source
+    source_text = plt.text(0.99,0.01,'',ha='right',va='bottom',transform=ax.transAxes,fontsize=11,color='white',fontweight='bold')
+
+    #Label total number of cases
+    total_text = None
+    if plot_type != 'confirmed_normalized':
+        total_text = plt.text(0.01,0.01,'',
+                 ha='left',va='bottom',transform=ax.transAxes,fontsize=11,color='w',fontweight='bold',bbox={'facecolor':'k', 'alpha':0.4, 'boxstyle':'round'})
+
+    return {'fig':fig,'ax':ax,'states':map_states,'collection':collection,'labels':labels,
+            'date_title':date_title,'source_text':source_text,'total_text':total_text}
+
+def update_frame(frame,plot_date,cases,m,color_obj,max_val):
+    """
+    Updates state colors, labels and titles of a frame from create_frame() for one date.
+    """
+
+    #Get state's case data for this date
+    idx = cases.date_index(plot_date)
+    map_values = {}
+    for name in frame['states']:
+        map_values[name] = cases[name.lower()][plot_type][idx]
+    total_cases = int(np.nansum(list(map_values.values())))
+
+    #Color states, with states without cases in gray
+    m.set_choropleth_values(frame['collection'],map_values,color_obj=color_obj,empty_color='#eeeeee')
+
+    #Update state labels
+    for name, label in frame['labels'].items():
+        case_number = map_values[name]
+
+        #Format case number as a string
+        case_str = str(case_number)
+        if plot_type == 'confirmed_normalized': case_str = '%0.1f'%(case_number)
+        elif np.isnan(case_number) == False: case_str = str(int(case_number))
+        if case_number == 0: case_str = " - "
+        label.set_text(case_str)
+
+        #Use white labels for arrows pointing to dark states
+        if hasattr(label,'arrow_patch') == True:
+            ncolor = 'k' if background_image['alpha'] == 1 else 'w'
+            if ncolor == 'k' and case_number > (max_val*0.8): ncolor = 'w'
+            label.set_color(ncolor)
+            label.arrow_patch.set_color(ncolor)
+
+    #Update date title
     add_label = 'as of' if plot_type in ['active','daily'] else 'through'
-    plt.title(f"Cases {add_label} {plot_start_date.strftime('%d %B %Y')}",fontweight='bold',fontsize=14,loc='right')
+    frame['date_title'].set_text(f"Cases {add_label} {plot_date.strftime('%d %B %Y')}")
 
     #Label data source
-    if worldometers == False or worldometers == True and plot_start_date < dt.datetime(2020,3,18):
-        plt.text(0.99,0.01,'Data from Johns Hopkins CSSE:\nhttps://github.com/CSSEGISandData/COVID-19',
-                 ha='right',va='bottom',transform=ax.transAxes,fontsize=11,color='white',fontweight='bold')
+    if worldometers == False or worldometers == True and plot_date < dt.datetime(2020,3,18):
+        frame['source_text'].set_text('Data from Johns Hopkins CSSE:\nhttps://github.com/CSSEGISandData/COVID-19')
     else:
-        plt.text(0.99,0.01,'Data from Worldometers:\nhttps://www.worldometers.info/coronavirus/',
-                 ha='right',va='bottom',transform=ax.transAxes,fontsize=11,color='white',fontweight='bold')
+        frame['source_text'].set_text('Data from Worldometers:\nhttps://www.worldometers.info/coronavirus/')
 
     #Label total number of cases
-    if plot_type != 'confirmed_normalized':
+    if frame['total_text'] is not None:
         if worldometers == False:
             dp_cases = cases['diamond princess'][plot_type][idx]
             gp_cases = cases['grand princess'][plot_type][idx]
-            other_cases = dp_cases + gp_cases
-            title_string = f'Repatriated Cases: {other_cases}\n\nTotal US Cases: {total_cases}\nTotal US Cases (With Repatriated): {total_cases+other_cases}'
+            other_cases = int(np.nansum([dp_cases,gp_cases]))
+            title_string = f'Repatriated Cases: {other_cases:,}\n\nTotal US Cases: {total_cases:,}\nTotal US Cases (With Repatriated): {total_cases+other_cases:,}'
         else:
-            title_string = f'Total US Cases: {total_cases}'
-        plt.text(0.01,0.01,title_string,
-                 ha='left',va='bottom',transform=ax.transAxes,fontsize=11,color='w',fontweight='bold',bbox={'facecolor':'k', 'alpha':0.4, 'boxstyle':'round'})
+            title_string = f'Total US Cases: {total_cases:,}'
+        frame['total_text'].set_text(title_string)
+
+def plot_map(plot_date,cases,m,states,color_obj,max_val):
+    """
+    Plots the map for one date, then saves or displays it.
+    """
+
+    frame = create_frame(cases,m,states,color_obj)
+    update_frame(frame,plot_date,cases,m,color_obj,max_val)
 
     #Save image?
     if save_image['setting'] == True:
-        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_{plot_start_date.strftime('%Y%m%d')}.png")
+        savepath = os.path.join(save_image['directory_path'],f"{plot_type}_{plot_date.strftime('%Y%m%d')}.png")
         plt.savefig(savepath,bbox_inches='tight')
     else:
         plt.show()
     plt.close()
-    
-    #Increment date
-    plot_start_date += dt.timedelta(hours=24)
 
-#Alert script is done
-print("Done!")
+def animate_maps(plot_dates,cases,m,states,color_obj,max_val):
+    """
+    Writes an animation of the maps for several dates. The figure is created once, and only the
+    state colors, labels and titles are updated for each frame.
+    """
+
+    frame = create_frame(cases,m,states,color_obj)
+    if animation['path'].endswith('.gif'):
+        writer = manimation.PillowWriter(fps=animation['fps'])
+    else:
+        writer = manimation.FFMpegWriter(fps=animation['fps'])
+    with writer.saving(frame['fig'],animation['path'],dpi=frame['fig'].dpi):
+        for date in plot_dates:
+            print(f"------> Report date {date}")
+            update_frame(frame,date,cases,m,color_obj,max_val)
+            writer.grab_frame()
+    plt.close(frame['fig'])
+
+#========================================================================================================
+# Render dates in parallel
+#========================================================================================================
+
+#Case data, map and shapefile of each render process
+_worker = {}
+
+def init_worker(cases,color_obj,max_val,settings):
+    """
+    Prepares a render process. The map projection and state geometries are created once per process
+    and reused for every date it renders.
+    """
+
+    plt.switch_backend('Agg')
+    globals().update(settings)
+    m = create_map()
+    _worker.update({'cases':cases,'color_obj':color_obj,'max_val':max_val,'m':m,'states':read_states(m)})
+
+def render_worker(date):
+    plot_map(date,_worker['cases'],_worker['m'],_worker['states'],_worker['color_obj'],_worker['max_val'])
+    return date
+
+#========================================================================================================
+# Create plots
+#========================================================================================================
+
+if __name__ == '__main__':
+
+    #COVID-19 case data is retrieved from Johns Hopkins CSSE:
+    #https://github.com/CSSEGISandData/COVID-19
+
+    #Avoid re-reading case data if it's already stored in memory
+    try:
+        cases
+    except:
+        print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
+
+        if read_from_local == True:
+            cases = read_data.load_snapshot('cases_us')
+            dates = cases.date_list
+        else:
+            output = read_data.get_dataset('us',worldometers=worldometers)
+            dates = output['dates']
+            cases = output['cases']
+
+    #Apply date overrides, including when case data is already in memory
+    if worldometers == True: include_repatriated = False
+    if plot_today_only == True:
+        plot_start_date = dates[-1]
+        plot_end_date = dates[-1]
+    if plot_type not in ['confirmed','confirmed_normalized','deaths','recovered','active','daily']: plot_type = 'confirmed'
+
+    color_obj, max_val = create_colortable(cases)
+
+    #Dates to plot
+    plot_dates = []
+    while plot_start_date <= plot_end_date:
+        plot_dates.append(plot_start_date)
+        plot_start_date += dt.timedelta(hours=24)
+
+    #Create Cartopy projection & read in states, unless already stored in memory
+    try:
+        m
+    except:
+        m = create_map()
+        proj = m.proj
+    try:
+        states
+    except:
+        states = read_states(m)
+
+    #Write an animation of all dates, updating one figure for each date
+    if animation['setting'] == True:
+        animate_maps(plot_dates,cases,m,states,color_obj,max_val)
+
+    #Render saved images of multiple dates in a pool of processes
+    elif processes > 1 and save_image['setting'] == True and len(plot_dates) > 1:
+        settings = {'plot_type':plot_type,'background_image':background_image,'save_image':save_image,
+                    'worldometers':worldometers}
+
+        #Pass the worker functions from the importable module rather than __main__, which is
+        #another program when this script is run by render_daemon
+        import plot_conus_map
+        with ProcessPoolExecutor(max_workers=processes,initializer=plot_conus_map.init_worker,
+                                 initargs=(cases,color_obj,max_val,settings)) as executor:
+            for date in executor.map(plot_conus_map.render_worker,plot_dates,chunksize=max(len(plot_dates)//(processes*4),1)):
+                print(f"------> Rendered report date {date}")
+
+    else:
+
+        #Iterate through dates
+        for date in plot_dates:
+            print(f"------> Report date {date}")
+            plot_map(date,cases,m,states,color_obj,max_val)
+
+    #Alert script is done
+    print("Done!")
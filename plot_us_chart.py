@@ -1,5 +1,4 @@
 #Import packages & other scripts
-import pickle
 import os, sys
 import requests
 import numpy as np
@@ -62,16 +61,16 @@ try:
 except:
     print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
 
-    if worldometers == True: include_repatriated = False
     if read_from_local == True:
-        cases = pickle.load(open('cases_us.pickle','rb'))
-        dates = cases['dates']
-        del cases['dates']
+        cases = read_data.load_snapshot('cases_us')
+        dates = cases.date_list
     else:
-        output = read_data.read_us(worldometers=worldometers)
+        output = read_data.get_dataset('us',worldometers=worldometers)
         dates = output['dates']
         cases = output['cases']
 
+if worldometers == True: include_repatriated = False
+
 #========================================================================================================
 # Create plot based on type
 #========================================================================================================
@@ -132,6 +131,7 @@ for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
         #Plot lines
         label_text = cases[key][plot_type][-1]
         if plot_type == "confirmed_normalized": label_text = "%0.1f"%(label_text)
+        elif np.isnan(label_text) == False: label_text = int(label_text)
         plt.plot(cases[key]['date'],cases[key][plot_type],mtype,zorder=zord,linewidth=linewidth,
                  label=f"{key.title()} ({label_text})",**kwargs)
 
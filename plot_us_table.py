@@ -1,15 +1,14 @@
 #Import packages & other scripts
-import pickle
 import os, sys
 import requests
 import numpy as np
 import pandas as pd
 import datetime as dt
-import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
 import read_data
+import table_renderer
 from color_gradient import Gradient
 
 #========================================================================================================
@@ -25,6 +24,9 @@ plot_end_today = True #If true, overrides plot_end_date
 save_image = {'setting': False,
               'directory_path': "full_directory_path_here"}
 
+#Additional formats to export the table to ("html", "svg"), saved to the "directory_path" above
+export_formats = []
+
 #What to plot (confirmed, deaths, recovered, active, daily)
 plot_type = "deaths"
 
@@ -58,17 +60,17 @@ try:
 except:
     print("--> Reading in COVID-19 case data from Johns Hopkins CSSE")
 
-    if worldometers == True: include_repatriated = False
     if read_from_local == True:
-        cases = pickle.load(open('cases_us.pickle','rb'))
-        dates = cases['dates']
-        del cases['dates']
+        cases = read_data.load_snapshot('cases_us')
+        dates = cases.date_list
     else:
-        output = read_data.read_us(negative_daily=False,worldometers=worldometers)
+        output = read_data.get_dataset('us',negative_daily=False,worldometers=worldometers)
         dates = output['dates']
         cases = output['cases']
-    
-    if plot_end_today == True: plot_end_date = dates[-1]
+
+#Apply date overrides, including when case data is already in memory
+if worldometers == True: include_repatriated = False
+if plot_end_today == True: plot_end_date = dates[-1]
 
 #========================================================================================================
 # Create plot based on type
@@ -85,7 +87,6 @@ total_count = np.array([0.0 for i in cases['new york']['date']])
 total_count_row = np.array([0.0 for i in cases['new york']['date']])
 
 #Empty array
-data_annot = []
 data = []
 rows = []
 
@@ -106,7 +107,6 @@ for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
     idx_end = dates.index(plot_end_date)
 
     #Append to data
-    data_annot.append(['-' if i == 0 or np.isnan(i) == True else str(i) for i in cases[key][plot_type][idx_start:idx_end+1]])
     data.append(cases[key][plot_type][idx_start:idx_end+1])
 
     #Append location to row
@@ -118,7 +118,6 @@ columns = [i.strftime('%b\n%d') for i in dates][idx_start:idx_end+1]
 
 #Add total?
 if plot_total == True:
-    data_annot.insert(0,['-' if i == 0 or np.isnan(i) == True else str(int(i)) for i in total_count][idx_start:idx_end+1])
     data.insert(0,[0 if np.isnan(i) == True else int(i) for i in total_count][idx_start:idx_end+1])
     rows.insert(0,"U.S. Total")
 
@@ -134,9 +133,8 @@ color_obj = Gradient([['#EEEEEE',0.0],['#EEEEEE',0.9]],
                      [['#B53079',int(max_val*0.3)],['#070092',int(max_val*0.7)]],
                      [['#070092',int(max_val*0.7)],['#000000',int(max_val*1.2)]])
 
-#Retrieve colormap
-clevs = np.append(np.array([0,0.95,1.0]),np.arange(2,max_val,1))
-cmap = color_obj.get_cmap(clevs)
+#Retrieve colormap, with zero values below the colormap's range in gray
+cmap = color_obj.get_lut(0.9,max_val,1024)
 
 #Determine figure width
 mval = np.nanmax(data)
@@ -153,13 +151,13 @@ if fig_width < 14: fig_width = 14
 #Create figure
 fig,ax = plt.subplots(figsize=(fig_width,16),dpi=150) #32,2
 
-#Reformat data into Pandas DataFrame
-data_df = pd.DataFrame(data,index=rows,columns=columns)
+#Format cell annotations
+data = np.array(data,dtype=np.float64)
+data_annot = table_renderer.format_values(data)
 
-#Plot seaborn heatmap
-ax = sns.heatmap(data_df, xticklabels=True, yticklabels=True, cmap=cmap, linewidths=0.5,
-                 cbar_kws = dict(use_gridspec=False,location="bottom",fraction=0.05, pad=0.008),
-                 annot_kws = dict(fontsize=12), annot=np.array(data_annot), fmt = '')
+#Plot table
+ax = table_renderer.render_table(data, rows, columns, cmap, color_obj.norm, annot=data_annot, ax=ax, fontsize=12, linewidths=0.5,
+                                 cbar_kws = dict(use_gridspec=False,location="bottom",fraction=0.05, pad=0.008))
 
 #Format ticks
 ax.tick_params(right=True, top=True, labelright=True, labeltop=True,
@@ -187,6 +185,14 @@ if worldometers == True:
 else:
     plt.title(f"Data from Johns Hopkins CSSE",loc='right',fontsize=10, pad=50, color='blue')
 
+#Export table to other formats
+for export_format in export_formats:
+    export_path = os.path.join(save_image['directory_path'],f"{plot_type}_us_table.{export_format}")
+    if export_format == 'html':
+        table_renderer.write_html(export_path,data,rows,columns,cmap,color_obj.norm,annot=data_annot,title=f"{title_string.get(plot_type)} {add_title}")
+    elif export_format == 'svg':
+        table_renderer.write_svg(export_path,data,rows,columns,cmap,color_obj.norm,annot=data_annot,title=f"{title_string.get(plot_type)} {add_title}")
+
 #Show plot and close
 if save_image['setting'] == True:
     savepath = os.path.join(save_image['directory_path'],f"{plot_type}_us_table.png")
@@ -1,5 +1,4 @@
 #Import packages & other scripts
-import pickle
 import os, sys
 import requests
 import numpy as np
@@ -59,11 +58,10 @@ try:
 except:
     
     if read_from_local == True:
-        cases = pickle.load(open('cases_world.pickle','rb'))
-        dates = cases['dates']
-        del cases['dates']
+        cases = read_data.load_snapshot('cases_world')
+        dates = cases.date_list
     else:
-        output = read_data.read_world(worldometers=worldometers)
+        output = read_data.get_dataset('world',worldometers=worldometers)
         dates = output['dates']
         cases = output['cases']
 
@@ -130,8 +128,10 @@ for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
                 kwargs['ms'] = 4; zord=50; kwargs['color'] = 'k'
         
         #Plot lines
+        label_text = cases[key][plot_type][-1]
+        if np.isnan(label_text) == False: label_text = int(label_text)
         plt.plot(cases[key]['date'],cases[key][plot_type],mtype,zorder=zord,linewidth=linewidth,
-                 label=f"{loc} ({cases[key][plot_type][-1]})",**kwargs)
+                 label=f"{loc} ({label_text})",**kwargs)
 
 #Plot total count
 if plot_total == True:
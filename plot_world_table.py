@@ -1,15 +1,14 @@
 #Import packages & other scripts
-import pickle
 import os, sys
 import requests
 import numpy as np
 import pandas as pd
 import datetime as dt
-import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
 import read_data
+import table_renderer
 from color_gradient import Gradient
 
 #========================================================================================================
@@ -25,6 +24,9 @@ plot_end_today = True #If true, overrides plot_end_date
 save_image = {'setting': False,
               'directory_path': "full_directory_path_here"}
 
+#Additional formats to export the table to ("html", "svg"), saved to the "directory_path" above
+export_formats = []
+
 #What to plot (confirmed, confirmed_normalized, deaths, recovered, active, daily, daily_deaths)
 plot_type = "confirmed"
 
@@ -54,30 +56,39 @@ https://github.com/CSSEGISandData/COVID-19
 
 #Avoid re-reading case data if it's already stored in memory
 try:
-    cases2
+    cases
 except:
     
     if read_from_local == True:
-        cases = pickle.load(open('cases_world.pickle','rb'))
-        dates = cases['dates']
-        del cases['dates']
+        cases = read_data.load_snapshot('cases_world')
+        dates = cases.date_list
+    elif us_states == True:
+        #Read countries and US states in a single pass over the daily reports
+        output = read_data.get_datasets(['world','us'],negative_daily=False,worldometers={'world':worldometers,'us':False})
+        dates = output['world']['dates']
+        cases = output['world']['cases']
+        cases_us = output['us']['cases']
     else:
-        output = read_data.read_world(negative_daily=False,worldometers=worldometers)
+        output = read_data.get_dataset('world',negative_daily=False,worldometers=worldometers)
         dates = output['dates']
         cases = output['cases']
-    
-    if plot_end_today == True: plot_end_date = dates[-1]
-    
-    #Substitute US for states
-    if us_states == True:
-        del cases['us']
-        for case in cases.keys():
-            cases[case]['us'] = False
-        output_us = read_data.read_us(negative_daily=False)
+
+#Apply date overrides, including when case data is already in memory
+if plot_end_today == True: plot_end_date = dates[-1]
+
+#Substitute US for states, unless already substituted
+if us_states == True and 'us' in cases.keys():
+    del cases['us']
+    for case in cases.keys():
+        cases[case]['us'] = False
+    try:
+        cases_us
+    except:
+        output_us = read_data.get_dataset('us',negative_daily=False)
         cases_us = output_us['cases']
-        for case in cases_us.keys():
-            cases_us[case]['us'] = True
-        cases.update(cases_us)
+    for case in cases_us.keys():
+        cases_us[case]['us'] = True
+    cases.update(cases_us)
 
 #========================================================================================================
 # Create plot based on type
@@ -94,7 +105,6 @@ total_count = np.array([0.0 for i in cases['mainland china']['date']])
 total_count_row = np.array([0.0 for i in cases['mainland china']['date']])
 
 #Empty array
-data_annot = []
 data = []
 rows = []
 
@@ -118,10 +128,6 @@ for idx,(key,value) in enumerate(zip(sorted_keys,sorted_value)):
     idx_end = dates.index(plot_end_date)
 
     #Append to data
-    if plot_type == 'confirmed_normalized':
-        data_annot.append(['-' if i == 0 or np.isnan(i) == True else "%0.1f"%(i) for i in cases[key][plot_type][idx_start:idx_end+1]])
-    else:
-        data_annot.append(['-' if i == 0 or np.isnan(i) == True else str(i) for i in cases[key][plot_type][idx_start:idx_end+1]])
     data.append(cases[key][plot_type][idx_start:idx_end+1])
 
     #Append location to row
@@ -134,10 +140,6 @@ columns = [i.strftime('%b\n%d') for i in dates][idx_start:idx_end+1]
 
 #Add total?
 if plot_total == True:
-    if plot_type == 'confirmed_normalized':
-        data_annot.insert(0,['-' if i == 0 or np.isnan(i) == True else "%0.1f"%(i) for i in total_count][idx_start:idx_end+1])
-    else:
-        data_annot.insert(0,['-' if i == 0 or np.isnan(i) == True else str(int(i)) for i in total_count][idx_start:idx_end+1])
     data.insert(0,[0 if np.isnan(i) == True else int(i) for i in total_count][idx_start:idx_end+1])
     rows.insert(0,"World Total")
 
@@ -153,9 +155,8 @@ color_obj = Gradient([['#EEEEEE',0.0],['#EEEEEE',0.9]],
                      [['#B53079',int(max_val*0.3)],['#070092',int(max_val*0.7)]],
                      [['#070092',int(max_val*0.7)],['#000000',int(max_val*1.2)]])
 
-#Retrieve colormap
-clevs = np.append(np.array([0,0.95,1.0]),np.arange(2,max_val,1))
-cmap = color_obj.get_cmap(clevs)
+#Retrieve colormap, with zero values below the colormap's range in gray
+cmap = color_obj.get_lut(0.9,max_val,1024)
 
 #Determine figure width
 mval = np.nanmax(data)
@@ -172,13 +173,13 @@ if fig_width < 14: fig_width = 14
 #Create figure
 fig,ax = plt.subplots(figsize=(fig_width,16),dpi=150) #32,2
 
-#Reformat data into Pandas DataFrame
-data_df = pd.DataFrame(data,index=rows,columns=columns)
+#Format cell annotations
+data = np.array(data,dtype=np.float64)
+data_annot = table_renderer.format_values(data,decimals=1 if plot_type == 'confirmed_normalized' else 0)
 
-#Plot seaborn heatmap
-ax = sns.heatmap(data_df, xticklabels=True, yticklabels=True, cmap=cmap, linewidths=0.5,
-                 cbar_kws = dict(use_gridspec=False,location="bottom",fraction=0.05, pad=0.008),
-                 annot_kws = dict(fontsize=12), annot=np.array(data_annot), fmt = '')
+#Plot table
+ax = table_renderer.render_table(data, rows, columns, cmap, color_obj.norm, annot=data_annot, ax=ax, fontsize=12, linewidths=0.5,
+                                 cbar_kws = dict(use_gridspec=False,location="bottom",fraction=0.05, pad=0.008))
 
 #Format ticks
 ax.tick_params(right=True, top=True, labelright=True, labeltop=True,
@@ -208,6 +209,14 @@ if worldometers == True:
 else:
     plt.title(f"Data from Johns Hopkins CSSE",loc='right',fontsize=10, pad=50, color='blue')
 
+#Export table to other formats
+for export_format in export_formats:
+    export_path = os.path.join(save_image['directory_path'],f"{plot_type}_world_table.{export_format}")
+    if export_format == 'html':
+        table_renderer.write_html(export_path,data,rows,columns,cmap,color_obj.norm,annot=data_annot,title=f"{title_string.get(plot_type)} {add_title}")
+    elif export_format == 'svg':
+        table_renderer.write_svg(export_path,data,rows,columns,cmap,color_obj.norm,annot=data_annot,title=f"{title_string.get(plot_type)} {add_title}")
+
 #Show plot and close
 if save_image['setting'] == True:
     savepath = os.path.join(save_image['directory_path'],f"{plot_type}_world_table.png")
@@ -1,474 +1,607 @@
 #Import packages & other scripts
 import pickle
 import os, sys
-import requests
 import numpy as np
 import pandas as pd
 import datetime as dt
+import collections
+from concurrent.futures import ProcessPoolExecutor
 
-def read_us(negative_daily=True,worldometers=False,save=False):
+import fetch_data
+import case_db
+import corrections
+import locations
+import report_schema
+import worldometers_data
+from case_store import CaseStore, RAW_METRICS
 
-    #Construct list of dates with data available, through today
-    start_date = dt.datetime(2020,1,22)
-    iter_date = dt.datetime(2020,1,22)
-    end_date = dt.datetime.today()
-    dates = []
-    while iter_date <= end_date:
-        
-        #Read in CSV file without worldometer
-        if worldometers == False or worldometers == True and start_date < dt.datetime(2020,3,18):
-            strdate = iter_date.strftime("%m-%d-%Y")
-            url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-            request = requests.get(url)
-            if request.status_code == 200:
-                dates.append(iter_date)
-        
-        #Use worldometers
-        else:
-            strdate = iter_date.strftime("%Y%m%d")
-            if os.path.isfile(f"data/worldometers/us_{strdate}.csv") == True: dates.append(iter_date)
-        
-        #Increment date
+#Date from which Worldometers data is used in place of CSSE data, if requested
+WORLDOMETERS_START_DATE = dt.datetime(2020,3,18)
+
+def report_sources(dates,worldometers=False):
+    """
+    Returns the data source ("csse" or "worldometers") used for each of the passed dates.
+    """
+
+    return ['csse' if worldometers == False or date < WORLDOMETERS_START_DATE else 'worldometers' for date in dates]
+
+#Columns of the normalized rows yielded by iter_daily_reports
+ROW_COLUMNS = ['Region','Country/Region','Province/State','Admin2','Confirmed','Deaths','Recovered']
+
+def _normalize_us(df,date,source,resolver):
+    """
+    Converts a US report into normalized rows, with the key of each row's state in the "Region"
+    column. CSSE reports are passed in the canonical format returned by report_schema.read_report.
+    """
+
+    #Isolate cases to only those in US
+    if source == 'csse':
+        df = df.loc[df["Country/Region"] == "US",ROW_COLUMNS[1:]]
+    else:
+        df = df.rename(columns={"State":"Province/State",
+                                "Total Cases":"Confirmed",
+                                "Total Deaths":"Deaths",
+                                "Total Recovered":"Recovered"})
+        df = df[['Province/State','Confirmed','Deaths','Recovered']].fillna(0).assign(**{'Country/Region':'US','Admin2':''})
+
+    #Map every location to the key of its entry in cases
+    keys = {}
+    for location in df['Province/State'].unique():
+        keys[location] = resolver.resolve(location)
+
+        #Special handling for 2/21/2020
+        if date == dt.datetime(2020,2,21):
+            if "Lackland, TX" in location or "Travis, CA" in location or "Ashland, NE" in location:
+                keys[location] = "diamond princess"
+
+    return df.assign(Region=df['Province/State'].map(keys))[ROW_COLUMNS].reset_index(drop=True)
+
+def _normalize_world(df,date,source,resolver):
+    """
+    Converts a world report into normalized rows, with the key of each row's country in the
+    "Region" column. CSSE reports are passed in the canonical format returned by
+    report_schema.read_report.
+    """
+
+    #Order rows by country as named in the report
+    if source == 'csse':
+        df = df.sort_values('Country/Region',kind='stable')
+    else:
+        df = df.rename(columns={"State":"Country/Region",
+                                "Total Cases":"Confirmed",
+                                "Total Deaths":"Deaths",
+                                "Total Recovered":"Recovered"})
+        df = df[['Country/Region','Confirmed','Deaths','Recovered']].fillna(0).assign(**{'Province/State':'','Admin2':''})
+
+    #Map every location to its region key, accounting for country name changes
+    return df.assign(Region=resolver.resolve_all(df['Country/Region']))[ROW_COLUMNS].reset_index(drop=True)
+
+def aggregate_rows(frame,by='Region'):
+    """
+    Sums normalized rows by a key column, returning a frame of integer "Confirmed", "Deaths"
+    and "Recovered" totals indexed by key. Rows with no key are discarded.
+    """
+
+    totals = frame.groupby(by,sort=False)[['Confirmed','Deaths','Recovered']].sum().astype(np.int64)
+    totals.attrs['source'] = frame.attrs.get('source')
+    return totals
+
+#Location resolvers used by parse worker processes, created on first use in each process
+_worker_resolvers = {}
+
+def _parse_report(scopes,date,content,resolvers=None,aggregate=True):
+    """
+    Parses a raw CSSE report once and returns a dict of {scope: frame} for each of the passed
+    scopes, with the region totals of each scope, or its normalized rows if aggregate is False.
+    Totals are summed here so worker processes return compact frames. This runs in worker processes when reports are
+    parsed in parallel, in which case each worker creates its own location resolvers.
+    """
+
+    if resolvers is None:
+        for scope in scopes:
+            if scope not in _worker_resolvers: _worker_resolvers[scope] = locations.LocationResolver(scope,'csse')
+        resolvers = _worker_resolvers
+
+    df = report_schema.read_report(content)
+    frames = {}
+    for scope in scopes:
+        normalize = _normalize_us if scope == 'us' else _normalize_world
+        frames[scope] = normalize(df,date,'csse',resolvers[scope])
+        frames[scope].attrs['source'] = 'csse'
+        if aggregate == True: frames[scope] = aggregate_rows(frames[scope])
+    return frames
+
+def iter_daily_levels(sources,start=fetch_data.FIRST_REPORT_DATE,end=None,workers=8,base_url=fetch_data.CSSE_URL,
+                      cache_dir='cache',processes=None,aggregate=True):
+    """
+    Reads daily reports one at a time for several datasets at once, downloading and parsing
+    each CSSE report only once. See iter_daily_reports for a description of the arguments.
+
+    Parameters:
+    ----------------------
+    sources
+        Dict of {scope: source}, with the data source ("csse" or "worldometers") to use
+        for each dataset ("us" or "world").
+
+    Returns:
+    ----------------------
+    Generator of (date, frames) tuples, one per date with data available for any dataset,
+    where frames is a dict of {scope: frame} for the datasets with data on that date.
+    """
+
+    resolvers = {scope:locations.LocationResolver(scope,'worldometers') for scope in sources.keys()}
+
+    #Index of available worldometers snapshots, from a single directory listing
+    snapshot_index = worldometers_data.scan() if 'worldometers' in sources.values() else {}
+    readers = {}
+
+    #Datasets read from CSSE vs. worldometers on each date through the end date
+    if end is None: end = dt.datetime.today()
+    csse_scopes = {}
+    worldometers_scopes = collections.OrderedDict()
+    iter_date = start
+    while iter_date <= end:
+        for scope, source in sources.items():
+            if report_sources([iter_date],source == 'worldometers')[0] == 'csse':
+                csse_scopes.setdefault(iter_date,[]).append(scope)
+            elif iter_date in snapshot_index.get(scope,{}):
+                worldometers_scopes.setdefault(iter_date,[]).append(scope)
         iter_date += dt.timedelta(hours=24)
 
-    #US states list
-    state_abbr = {
-        'AL':'Alabama',
-        'AK':'Alaska',
-        'AZ':'Arizona',
-        'AR':'Arkansas',
-        'CA':'California',
-        'CO':'Colorado',
-        'CT':'Connecticut',
-        'DE':'Delaware',
-        'D.C.':'District of Columbia',
-        'FL':'Florida',
-        'GA':'Georgia',
-        'HI':'Hawaii',
-        'ID':'Idaho',
-        'IL':'Illinois',
-        'IN':'Indiana',
-        'IA':'Iowa',
-        'KS':'Kansas',
-        'KY':'Kentucky',
-        'LA':'Louisiana',
-        'ME':'Maine',
-        'MD':'Maryland',
-        'MA':'Massachusetts',
-        'MI':'Michigan',
-        'MN':'Minnesota',
-        'MS':'Mississippi',
-        'MO':'Missouri',
-        'MT':'Montana',
-        'NE':'Nebraska',
-        'NV':'Nevada',
-        'NH':'New Hampshire',
-        'NJ':'New Jersey',
-        'NM':'New Mexico',
-        'NY':'New York',
-        'NC':'North Carolina',
-        'ND':'North Dakota',
-        'OH':'Ohio',
-        'OK':'Oklahoma',
-        'OR':'Oregon',
-        'PA':'Pennsylvania',
-        'RI':'Rhode Island',
-        'SC':'South Carolina',
-        'SD':'South Dakota',
-        'TN':'Tennessee',
-        'TX':'Texas',
-        'UT':'Utah',
-        'VT':'Vermont',
-        'VA':'Virginia',
-        'WA':'Washington',
-        'WV':'West Virginia',
-        'WI':'Wisconsin',
-        'WY':'Wyoming',
-        'VI':'Virgin Islands',
-        'PR':'Puerto Rico',
-    }
-    
-    #Read country population data
-    pop_df = pd.read_csv("data/2019_us_population.csv")
-    state_populations = {}
-    for location,row in pop_df.iterrows():
-        state_populations[row['State'].lower()] = int(row['Population'])
-
-    #Create entry for each US state, along with Diamond Princess
-    cases = {}
-    inverse_state_abbr = {v: k for k, v in state_abbr.items()}
-    for key in ['diamond princess','grand princess'] + [key.lower() for key in inverse_state_abbr.keys()]:
-        cases[key] = {'date':dates,
-                        'confirmed':[0 for i in range(len(dates))],
-                        'confirmed_normalized':[0 for i in range(len(dates))],
-                        'deaths':[0 for i in range(len(dates))],
-                        'recovered':[0 for i in range(len(dates))],
-                        'active':[0 for i in range(len(dates))],
-                        'daily':[0 for i in range(len(dates))]}
-    
-    #Construct list of dates
-    start_date = dates[0]
-    end_date = dates[-1]
-    while start_date <= end_date:
-
-        #Read in CSV file without worldometer
-        if worldometers == False or worldometers == True and start_date < dt.datetime(2020,3,18):
-            strdate = start_date.strftime("%m-%d-%Y")
-            url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-            df = pd.read_csv(url)
-            df = df.fillna(0) #replace NaNs with zero
-
-            #Isolate cases to only those in US
-            df_us = df.loc[df["Country/Region"] == "US"]
-        
-        #Read in CSV file with worldometer
-        else:
-            strdate = start_date.strftime("%Y%m%d")
-            df_us = pd.read_csv(f"data/worldometers/us_{strdate}.csv")
-            df_us = df_us.rename(columns={"State":"Province/State",
-                                    "Total Cases":"Confirmed",
-                                    "Total Deaths":"Deaths",
-                                    "Total Recovered":"Recovered"})
-            if 'puerto rico' in cases.keys(): del cases['puerto rico']
-            if 'virgin islands' in cases.keys(): del cases['virgin islands']
-            if 'diamond princess' in cases.keys(): del cases['diamond princess']
-            if 'grand princess' in cases.keys(): del cases['grand princess']
-
-        #Construct dict of all states
-        dict_iter = []
-        dict_used = []
-        for _,row in df_us.iterrows():
-            entry = {}
-            
-            dict_used.append(row['Province/State'].lower())
-            entry['Province/State'] = row['Province/State']
-            entry['Confirmed'] = row['Confirmed']
-            entry['Deaths'] = row['Deaths']
-            entry['Recovered'] = row['Recovered']
-            
-            #Account for incorrect entries
-            #Source: Live update from Johns Hopkins CSSE from 0108 UTC
-            if worldometers == False and start_date == dt.datetime(2020,3,18):
-                df_updated = pd.read_csv("data/20200318_us.csv")
-                dict_updated = {}
-                for location,row2 in df_updated.iterrows():
-                    dict_updated[row2['state'].lower()] = [row2['cases'],row2['deaths']]
-                
-                if row['Province/State'].lower() in dict_updated.keys():
-                    entry['Confirmed'] = dict_updated.get(row['Province/State'].lower())[0]
-                    entry['Deaths'] = dict_updated.get(row['Province/State'].lower())[1]
-                
-            dict_iter.append(entry)
-        
-        #Account for state discontinuities
-        if worldometers == False or worldometers == True and start_date < dt.datetime(2020,3,18):
-            if start_date == dt.datetime(2020,3,14):
-                #Source: https://covidtracking.com/notes/
-                entry = {}
-                dict_used.append('alaska')
-                entry['Province/State'] = 'alaska'
-                entry['Confirmed'] = 1
-                entry['Deaths'] = 0
-                entry['Recovered'] = 0
-                dict_iter.append(entry)
-
-        #Iterate through every US case
-        for row in dict_iter:
-
-            #Get state/province name
-            location = row['Province/State']
-
-            #Get index of date within list
-            idx = dates.index(start_date)
-            
-            #Special handling for 2/21/2020
-            if start_date.strftime("%Y%m%d") == "20200221":
-                if "Lackland, TX" in location or "Travis, CA" in location or "Ashland, NE" in location:
-                    location = location + "(Diamond Princess)"
-
-            #Handle Diamond Princess cases separately
-            if "Diamond Princess" in location:
-                cases["diamond princess"]['confirmed'][idx] += int(row['Confirmed'])
-                cases["diamond princess"]['deaths'][idx] += int(row['Deaths'])
-                cases["diamond princess"]['recovered'][idx] += int(row['Recovered'])
-                cases["diamond princess"]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-                if idx == 0:
-                    cases["diamond princess"]['daily'][idx] = np.nan
-                else:
-                    daily_change = cases["diamond princess"]['confirmed'][idx] - cases["diamond princess"]['confirmed'][idx-1]
-                    if negative_daily == False and daily_change < 0: daily_change = 0
-                    cases["diamond princess"]['daily'][idx] = daily_change
-            
-            #Handle Grand Princess cases separately
-            elif "Grand Princess" in location:
-                cases["grand princess"]['confirmed'][idx] += int(row['Confirmed'])
-                cases["grand princess"]['deaths'][idx] += int(row['Deaths'])
-                cases["grand princess"]['recovered'][idx] += int(row['Recovered'])
-                cases["grand princess"]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-                if idx == 0:
-                    cases["grand princess"]['daily'][idx] = np.nan
-                else:
-                    daily_change = cases["grand princess"]['confirmed'][idx] - cases["grand princess"]['confirmed'][idx-1]
-                    if negative_daily == False and daily_change < 0: daily_change = 0
-                    cases["grand princess"]['daily'][idx] = daily_change
-                
-            #Otherwise, handle states
-            else:
-                #Handle state abbreviation vs. full state name
-                if worldometers == False or worldometers == True and start_date < dt.datetime(2020,3,18):
-                    if ',' in location:
-                        abbr = (location.split(",")[1]).replace(" ","")
-                        state = state_abbr.get(abbr)
-                    else:
-                        state = str(location)
-                else:
-                    state = str(location).lower()
-                   
-                #Virgin Islands handling
-                if location == "Virgin Islands, U.S.":
-                    state = "virgin islands"
-                
-                #Manually edit data points that are inaccurate due to CSSE server maintenance
-                if start_date == dt.datetime(2020,3,13):
-                    #Source: New York Times
-                    correct_number = {
-                        'new jersey':51,
-                        'arkansas':9,
-                        'colorado':77,
-                    }
-                    if state.lower() in correct_number.keys(): row['Confirmed'] = correct_number.get(state.lower())
-                
-                #Add cases to entry for this state & day
-                if state.lower() in cases.keys():
-                    cases[state.lower()]['confirmed'][idx] += int(row['Confirmed'])
-                    cases[state.lower()]['deaths'][idx] += int(row['Deaths'])
-                    cases[state.lower()]['recovered'][idx] += int(row['Recovered'])
-                    cases[state.lower()]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-                    if idx == 0:
-                        cases[state.lower()]['daily'][idx] = np.nan
-                    else:
-                        daily_change = cases[state.lower()]['confirmed'][idx] - cases[state.lower()]['confirmed'][idx-1]
-                        if negative_daily == False and daily_change < 0: daily_change = 0
-                        cases[state.lower()]['daily'][idx] = daily_change
-
-        #Normalize count by population
-        for key in cases.keys():
-            
-            #Get state's population data
-            state_pop = int(state_populations.get(key.lower()))
-            
-            #Get index of date within list
-            idx = dates.index(start_date)
-            
-            #Add case count per 100,000 people
-            case_count = cases[key]['confirmed'][idx]
-            cases[key]['confirmed_normalized'][idx] = (float(case_count) / float(state_pop)) * 100000
-        
-        #Increment date by 1 day
-        start_date += dt.timedelta(hours=24)
-    
-    if save == True:
-        cases['dates'] = dates
-        with open('cases_us.pickle', 'wb') as f:
-            pickle.dump(cases, f, pickle.HIGHEST_PROTOCOL)
-    
-    return {'dates':dates,
-            'cases':cases,}
-
-def read_world(negative_daily=True,worldometers=False,save=False):
-    
-    #Construct list of dates with data available, through today
-    start_date = dt.datetime(2020,1,22)
-    iter_date = dt.datetime(2020,1,22)
-    end_date = dt.datetime.today()
+    #Function for reading the worldometers snapshots for one date, loading only that date
+    def read_worldometers(date):
+        frames = {}
+        for scope in worldometers_scopes.pop(date):
+            if scope not in readers: readers[scope] = worldometers_data.SnapshotReader(scope,index=snapshot_index)
+            df = readers[scope][date]
+            normalize = _normalize_us if scope == 'us' else _normalize_world
+            frames[scope] = normalize(df,date,'worldometers',resolvers[scope])
+            frames[scope].attrs['source'] = 'worldometers'
+            if aggregate == True: frames[scope] = aggregate_rows(frames[scope])
+        return frames
+
+    #Merge CSSE reports with worldometers files in date order
+    for date, frames in _iter_csse_levels(csse_scopes,workers,base_url,cache_dir,processes,aggregate):
+        while len(worldometers_scopes) > 0 and next(iter(worldometers_scopes)) < date:
+            wm_date = next(iter(worldometers_scopes))
+            yield wm_date, read_worldometers(wm_date)
+        if date in worldometers_scopes: frames.update(read_worldometers(date))
+        yield date, frames
+    while len(worldometers_scopes) > 0:
+        wm_date = next(iter(worldometers_scopes))
+        yield wm_date, read_worldometers(wm_date)
+
+def _iter_csse_levels(csse_scopes,workers,base_url,cache_dir,processes,aggregate=True):
+    """
+    Downloads and parses the CSSE reports for the dates in csse_scopes, a dict of
+    {date: list of scopes}, and yields (date, frames) tuples in date order.
+    """
+
+    cache = fetch_data.ReportCache(cache_dir) if cache_dir is not None else None
+    reports = fetch_data.iter_reports(list(csse_scopes.keys()),workers=workers,base_url=base_url,cache=cache)
+    if processes is None or processes <= 1:
+        resolvers = {}
+        for scopes in csse_scopes.values():
+            for scope in scopes:
+                if scope not in resolvers: resolvers[scope] = locations.LocationResolver(scope,'csse')
+        for date, content in reports:
+            if content is None: continue
+            yield date, _parse_report(csse_scopes[date],date,content,resolvers,aggregate)
+
+    #Parse reports in worker processes, keeping at most 2*processes reports in flight
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = collections.deque()
+            for date, content in reports:
+                if content is not None:
+                    pending.append((date,executor.submit(_parse_report,csse_scopes[date],date,content,None,aggregate)))
+                while len(pending) > processes*2 or (len(pending) > 0 and pending[0][1].done() == True):
+                    done_date, future = pending.popleft()
+                    yield done_date, future.result()
+            for done_date, future in pending:
+                yield done_date, future.result()
+
+def iter_daily_reports(source='csse',start=fetch_data.FIRST_REPORT_DATE,end=None,scope='world',workers=8,
+                       base_url=fetch_data.CSSE_URL,cache_dir='cache',processes=None,aggregate=True):
+    """
+    Reads daily reports one at a time and yields the totals by region of each, or its
+    normalized rows. Reports are downloaded through a bounded window of concurrent requests,
+    Worldometers snapshots are read one date at a time, and both are discarded once parsed, so
+    memory use does not grow with the number of days read.
+
+    Parameters:
+    ----------------------
+    source
+        String denoting the data source. "csse" reads Johns Hopkins CSSE daily reports for all
+        dates; "worldometers" reads CSSE reports before 3/18/2020 and local Worldometers files
+        from "data/worldometers" afterwards.
+    start
+        First date to read (default is the first CSSE report, 1/22/2020).
+    end
+        Last date to read. If None, reads through today.
+    scope
+        String denoting the dataset to read ("us" or "world").
+    workers
+        Number of concurrent downloads (default is 8).
+    base_url
+        URL of the directory holding the CSSE daily reports.
+    cache_dir
+        Directory of the on-disk report cache. If None, reports are always downloaded.
+    processes
+        If greater than 1, CSSE reports are parsed and aggregated by this many worker
+        processes, and their frames are yielded back in date order. If None (default),
+        reports are parsed in this process.
+    aggregate
+        If True (default), yields totals by state or country. If False, yields the normalized
+        report rows, so they can be aggregated differently (e.g., by county) with fold_report.
+
+    Returns:
+    ----------------------
+    Generator of (date, frame) tuples, one per date with data available. With aggregate=True,
+    each frame is a pandas.DataFrame indexed by region key with integer "Confirmed", "Deaths"
+    and "Recovered" columns. With aggregate=False, each frame has one row per report row and
+    the columns in ROW_COLUMNS: "Region" holds the key of the row's state or country (None for
+    discarded locations), "Country/Region", "Province/State" and "Admin2" (county) hold the
+    names in the report, and "Confirmed", "Deaths" and "Recovered" hold the counts. The source
+    used for the date is stored in frame.attrs['source'].
+    """
+
+    for date, frames in iter_daily_levels({scope:source},start,end,workers,base_url,cache_dir,processes,aggregate):
+        yield date, frames[scope]
+
+def fold_report(cases,date,frame,add_regions=True,by=None):
+    """
+    Adds one day of totals by region to a CaseStore as a new date column.
+
+    Parameters:
+    ----------------------
+    cases
+        CaseStore instance to add the frame to.
+    date
+        Datetime object of the report.
+    frame
+        Frame of totals by region, as yielded by iter_daily_reports, or of normalized rows
+        (with aggregate=False) if "by" is passed.
+    add_regions
+        If True, adds entries for regions not yet in the store. Otherwise, regions not in
+        the store are ignored (default is True).
+    by
+        If passed, normalized rows are first summed by this key column with aggregate_rows,
+        e.g., "Region" for state or country totals, or a column built from "Province/State"
+        and "Admin2" for county totals. Default is None, for frames that are already totals.
+    """
+
+    if by is not None: frame = aggregate_rows(frame,by)
+    if add_regions == True:
+        rows = cases.add_regions(frame.index)
+    else:
+        frame = frame.loc[frame.index.isin(cases.index)]
+        rows = cases.rows(frame.index)
+    idx = cases.append_dates([date])
+    cases.add_values('confirmed',rows,idx,frame['Confirmed'].to_numpy())
+    cases.add_values('deaths',rows,idx,frame['Deaths'].to_numpy())
+    cases.add_values('recovered',rows,idx,frame['Recovered'].to_numpy())
+
+def fold_reports(cases,reports,add_regions=True,by=None):
+    """
+    Adds a stream of normalized daily frames to a CaseStore. Returns the list of dates added.
+    """
+
     dates = []
-    while iter_date <= end_date:
-        
-        #Don't use worldometers
-        if worldometers == False or worldometers == True and iter_date < dt.datetime(2020,3,18):
-            strdate = iter_date.strftime("%m-%d-%Y")
-            url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-            request = requests.get(url)
-            if request.status_code == 200: dates.append(iter_date)
-        
-        #Use worldometers
-        else:
-            strdate = iter_date.strftime("%Y%m%d")
-            if os.path.isfile(f"data/worldometers/world_{strdate}.csv") == True: dates.append(iter_date)
-        
-        #Increment date
-        iter_date += dt.timedelta(hours=24)
+    for date, frame in reports:
+        fold_report(cases,date,frame,add_regions,by)
+        dates.append(date)
+    return dates
+
+def load_snapshot(path,mmap_mode='r'):
+    """
+    Loads a snapshot previously written by read_us or read_world with save=True.
+    Snapshot directories are memory-mapped (see CaseStore.load); legacy pickle files
+    are also accepted. Returns a CaseStore with the snapshot's data.
+    """
+
+    if os.path.isdir(path) == True: return CaseStore.load(path,mmap_mode=mmap_mode)
+
+    with open(path,'rb') as f:
+        cases = pickle.load(f)
+    dates = cases['dates']
+    del cases['dates']
+    return CaseStore.from_dict(cases,dates)
+
+def save_snapshot(cases,path):
+    """
+    Writes a CaseStore to a snapshot directory readable by the plotting scripts.
+    """
+
+    cases.save(path)
+
+def _create_store(scope,negative_daily=True,update_from=None):
+    """
+    Creates the CaseStore for a dataset, or loads it from a snapshot if updating one.
+    Returns the store along with the first date to read.
+    """
+
+    #Load previous snapshot, if updating one
+    if update_from is not None:
+        cases = update_from if isinstance(update_from,CaseStore) else load_snapshot(update_from)
+
+    #Read from the day after the snapshot's last date, or in full if the snapshot has no dates
+    if update_from is not None and len(cases.date_list) > 0:
+        start_date = cases.date_list[-1] + dt.timedelta(hours=24)
+    else:
+        start_date = fetch_data.FIRST_REPORT_DATE
+
+    if scope == 'us':
+
+        #Read state population data
+        pop_df = pd.read_csv("data/2019_us_population.csv")
+        population = {}
+        for location,row in pop_df.iterrows():
+            population[row['State'].lower()] = int(row['Population'])
+
+        #Create entry for each US state, along with Diamond Princess
+        if update_from is None:
+            cases = CaseStore(metrics=['confirmed','confirmed_normalized','deaths','recovered','active','daily'],
+                              regions=locations.LocationResolver('us','csse').regions)
+        elif len(cases) == 0:
+            cases.add_regions(locations.LocationResolver('us','csse').regions)
+
+    else:
+
+        #Read country population data
+        pop_df = pd.read_csv("data/2019_world_population.csv")
+        population = {}
+        for location,row in pop_df.iterrows():
+            population[row['Country'].lower()] = row['Population']
+
+        if update_from is None:
+            cases = CaseStore(metrics=['confirmed','confirmed_normalized','deaths','recovered','active','daily','daily_deaths'])
+        cases.mask_daily('mainland china',dt.datetime(2020,2,13))
+
+    #Derived metrics are computed on access using these settings
+    cases.population = population
+    cases.negative_daily = negative_daily
+
+    return cases, start_date
+
+def _fold_level(scope,cases,date,frame):
+    """
+    Adds one day of a dataset to its CaseStore.
+    """
+
+    if scope == 'us':
+
+        #Worldometers data does not include territories and cruise ships
+        if frame.attrs['source'] == 'worldometers':
+            for key in ['puerto rico','virgin islands','diamond princess','grand princess']:
+                if key in cases.keys(): del cases[key]
+
+        #Only keep US states and cruise ships
+        fold_report(cases,date,frame,add_regions=False)
+
+    else:
+        fold_report(cases,date,frame)
+
+def read_levels(levels=['world','us'],negative_daily=True,worldometers=False,save=False,workers=8,
+                base_url=fetch_data.CSSE_URL,cache_dir='cache',update_from=None,database=None,processes=None,end=None):
+    """
+    Reads case data for several datasets in a single pass, downloading and parsing each
+    daily report only once.
+
+    Parameters:
+    ----------------------
+    levels
+        List of datasets to read ("world" for countries, "us" for US states).
+    negative_daily
+        Whether to allow negative daily changes. Either a boolean applied to all datasets or
+        a dict of {level: boolean}.
+    worldometers
+        Whether to use Worldometers data from March 18th onwards. Either a boolean applied to
+        all datasets or a dict of {level: boolean}.
+    save
+        If True, writes a snapshot directory ("cases_<level>") for each dataset.
+    workers
+        Number of concurrent downloads (default is 8).
+    base_url
+        URL of the directory holding the CSSE daily reports.
+    cache_dir
+        Directory of the on-disk report cache. If None, reports are always downloaded.
+    update_from
+        Dict of {level: snapshot path or CaseStore}. Datasets with a snapshot are updated
+        from the day after the snapshot's last date instead of being read in full (snapshots
+        with no dates are read in full). A passed CaseStore is updated in place.
+    database
+        Path of a SQLite database to write new dates to (see case_db). Default is None.
+    processes
+        Number of worker processes used to parse reports (see iter_daily_reports).
+    end
+        Last date to read. If None, reads through today's date.
+
+    Returns:
+    ----------------------
+    Dict of {level: {'dates':dates,'cases':cases}}
+    """
+
+    def option(value,level,default):
+        if isinstance(value,dict): return value.get(level,default)
+        return value
+
+    #Create stores for each dataset
+    stores = {}
+    start_dates = {}
+    for level in levels:
+        snapshot = option(update_from,level,None) if update_from is not None else None
+        stores[level], start_dates[level] = _create_store(level,option(negative_daily,level,True),snapshot)
+
+    #Read every daily report once, adding each dataset's totals to its store
+    sources = {level:('worldometers' if option(worldometers,level,False) == True else 'csse') for level in levels}
+    new_dates = {level:[] for level in levels}
+    for date, frames in iter_daily_levels(sources,min(start_dates.values()),end,workers=workers,base_url=base_url,
+                                          cache_dir=cache_dir,processes=processes):
+        for level, frame in frames.items():
+            if date < start_dates[level]: continue
+            _fold_level(level,stores[level],date,frame)
+            new_dates[level].append(date)
+
+    output = {}
+    for level in levels:
+        cases = stores[level]
+
+        #Manually edit data points that are inaccurate, as listed in data/corrections.csv
+        corrections.apply_corrections(cases,corrections.load_corrections(level),new_dates[level],
+                                      report_sources(new_dates[level],option(worldometers,level,False)))
+
+        #Write new dates to the SQLite database, if requested
+        if database is not None and len(new_dates[level]) > 0:
+            db = case_db.CaseDatabase(database,level)
+            db.write(cases,start=new_dates[level][0] if start_dates[level] > fetch_data.FIRST_REPORT_DATE else None)
+            db.close()
+
+        if save == True:
+            save_snapshot(cases,f'cases_{level}')
+
+        output[level] = {'dates':cases.date_list,
+                         'cases':cases}
+
+    return output
+
+def read_us(negative_daily=True,worldometers=False,save=False,workers=8,base_url=fetch_data.CSSE_URL,cache_dir='cache',
+            update_from=None,database=None,processes=None):
+
+    output = read_levels(['us'],negative_daily,worldometers,save,workers,base_url,cache_dir,
+                         None if update_from is None else {'us':update_from},database,processes)
+    return output['us']
+
+def read_world(negative_daily=True,worldometers=False,save=False,workers=8,base_url=fetch_data.CSSE_URL,cache_dir='cache',
+               update_from=None,database=None,processes=None):
+
+    output = read_levels(['world'],negative_daily,worldometers,save,workers,base_url,cache_dir,
+                         None if update_from is None else {'world':update_from},database,processes)
+    return output['world']
+
+#Maximum number of bytes of case data held in memory by get_datasets
+DATASET_CACHE_BYTES = 1024**3
+
+#Datasets read by get_datasets, keyed by (level, source, base_url), least recently used first
+_datasets = collections.OrderedDict()
+
+def get_datasets(levels,negative_daily=True,worldometers=False,update=False,workers=8,
+                 base_url=fetch_data.CSSE_URL,cache_dir='cache',processes=None):
+    """
+    Returns case data for several datasets, reading each from the daily reports only the first
+    time it is requested in this process. Each dataset is cached once per data source, and
+    variants that only differ in derived settings (e.g., negative_daily) are copies of it.
+
+    Parameters:
+    ----------------------
+    levels
+        List of datasets to return ("world" for countries, "us" for US states).
+    negative_daily
+        Whether to allow negative daily changes. Either a boolean applied to all datasets or
+        a dict of {level: boolean}.
+    worldometers
+        Whether to use Worldometers data from March 18th onwards. Either a boolean applied to
+        all datasets or a dict of {level: boolean}.
+    update
+        If True, cached datasets are updated with any dates after their last date.
+    workers, base_url, cache_dir, processes
+        Passed to read_levels.
+
+    Returns:
+    ----------------------
+    Dict of {level: {'dates':dates,'cases':cases}}. Each call returns new copies of the case
+    data, which can be modified without affecting the cache.
+    """
+
+    def option(value,level,default):
+        if isinstance(value,dict): return value.get(level,default)
+        return value
+
+    keys = {level:(level,'worldometers' if option(worldometers,level,False) == True else 'csse',base_url) for level in levels}
+
+    #Read datasets not yet cached, or new dates of cached ones, in a single pass
+    read = [level for level in levels if keys[level] not in _datasets or update == True]
+    if len(read) > 0:
+        #Update copies, so cached datasets are left intact if reading fails
+        update_from = {level:_datasets[keys[level]].copy() for level in read if keys[level] in _datasets}
+        output = read_levels(read,worldometers={level:option(worldometers,level,False) for level in read},workers=workers,
+                             base_url=base_url,cache_dir=cache_dir,update_from=update_from,processes=processes)
+        for level in read:
+            _datasets[keys[level]] = output[level]['cases']
+
+    #Evict least recently used datasets over the memory limit
+    for level in levels:
+        _datasets.move_to_end(keys[level])
+    while len(_datasets) > len(levels) and sum([cases.nbytes for cases in _datasets.values()]) > DATASET_CACHE_BYTES:
+        _datasets.popitem(last=False)
+
+    output = {}
+    for level in levels:
+        cases = _datasets[keys[level]].copy()
+        cases.negative_daily = option(negative_daily,level,True)
+        output[level] = {'dates':cases.date_list,
+                         'cases':cases}
+    return output
+
+def update_datasets(reread_from=None,workers=8,cache_dir='cache',processes=None):
+    """
+    Updates every dataset cached by get_datasets with any dates after its last date.
+
+    Parameters:
+    ----------------------
+    reread_from
+        If a date is passed, cached dates on or after it are dropped and read again, so that
+        revised reports (e.g., recent reports revalidated in the report cache, or modified
+        Worldometers snapshots) replace the values read before. Default is None.
+    workers, cache_dir, processes
+        Passed to read_levels.
+
+    Returns:
+    ----------------------
+    List of (level, source, base_url) keys of the datasets whose data changed. If reading
+    fails, the exception is raised and the cached datasets are left unchanged.
+    """
+
+    groups = collections.OrderedDict()
+    for level, source, base_url in _datasets.keys():
+        groups.setdefault((source,base_url),[]).append(level)
+
+    changed = []
+    for (source, base_url), levels in groups.items():
+
+        #Update copies, so cached datasets are left intact if reading fails
+        previous = {level:_datasets[(level,source,base_url)] for level in levels}
+        stores = {level:cases.copy() for level,cases in previous.items()}
+        if reread_from is not None:
+            for cases in stores.values():
+                cases.truncate(reread_from)
+        read_levels(levels,worldometers=source == 'worldometers',workers=workers,base_url=base_url,
+                    cache_dir=cache_dir,update_from=stores,processes=processes)
+
+        for level, cases in stores.items():
+            old = previous[level]
+            _datasets[(level,source,base_url)] = cases
+            same = old.regions == cases.regions and np.array_equal(old.dates,cases.dates)
+            if same == True: same = all([np.array_equal(old.values(metric),cases.values(metric)) for metric in RAW_METRICS])
+            if same == False: changed.append((level,source,base_url))
+    return changed
+
+def get_dataset(scope,negative_daily=True,worldometers=False,update=False,**kwargs):
+    """
+    Returns case data for one dataset from the cache of get_datasets, as {'dates':dates,'cases':cases}.
+    """
+
+    return get_datasets([scope],negative_daily,worldometers,update,**kwargs)[scope]
+
+def invalidate(scope=None):
+    """
+    Removes cached datasets, so the next request reads them again from the daily reports.
+
+    Parameters:
+    ----------------------
+    scope
+        Dataset to remove ("us" or "world"). If None, all datasets are removed.
+    """
 
-    #Create entry for each US state, along with Diamond Princess
-    cases = {}
-    
-    #Read country population data
-    pop_df = pd.read_csv("data/2019_world_population.csv")
-    population = {}
-    for location,row in pop_df.iterrows():
-        population[row['Country'].lower()] = row['Population']
-
-    #Construct list of dates
-    start_date = dates[0]
-    end_date = dates[-1]
-    while start_date <= end_date:
-
-        #Read in CSV file without worldometer
-        if worldometers == False or worldometers == True and start_date < dt.datetime(2020,3,18):
-            strdate = start_date.strftime("%m-%d-%Y")
-            url = f'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_daily_reports/{strdate}.csv'
-            df = pd.read_csv(url)
-            df = df.fillna(0) #replace NaNs with zero
-            
-            #sum by country
-            cols = (df.columns).tolist()
-            if 'Last Update' in cols: df = df.drop(columns=['Last Update'])
-            if 'Latitude' in cols: df = df.drop(columns=['Latitude'])
-            if 'Longitude' in cols: df = df.drop(columns=['Longitude'])
-            df = df.groupby('Country/Region').sum()
-        
-        #Read in CSV file with worldometer
-        else:
-            strdate = start_date.strftime("%Y%m%d")
-            df = pd.read_csv(f"data/worldometers/world_{strdate}.csv")
-            df = df.rename(columns={"State":"Country/Region",
-                                    "Total Cases":"Confirmed",
-                                    "Total Deaths":"Deaths",
-                                    "Total Recovered":"Recovered"})
-
-        #Iterate through every country
-        for location,row in df.iterrows():
-            
-            #Fix for country name changes
-            if worldometers == False or worldometers == True and start_date < dt.datetime(2020,3,18):
-                if location == 'Iran (Islamic Republic of)':
-                    location = "Iran"
-                elif location in ['Republic of Korea','Korea, South']:
-                    location = "South Korea"
-                elif location == 'Cruise Ship':
-                    location = "Others"
-                elif location == 'China':
-                    location = "Mainland China"
-                elif location == 'United Kingdom':
-                    location = "UK"
-                elif location == 'occupied Palestinian territory':
-                    location = "Palestine"
-                elif location in ['Taiwan*','Taipei and environs']:
-                    location = "Taiwan"
-                elif location in ['Czechia']:
-                    location = "Czech Republic"
-                elif location in ['Hong Kong SAR']:
-                    location = "Hong Kong"
-                elif location in ['Viet Nam']:
-                    location = "Vietnam"
-                elif location == " Azerbaijan":
-                    location = "Azerbaijan"
-                elif location == "Republic of Ireland":
-                    location = "Ireland"
-                elif location == "Russian Federation":
-                    location = "Russia"
-            
-            #Change country names for worldometers data
-            else:
-                swap_locs = {
-                    "China":"Mainland China",
-                    "USA":"US",
-                    "S. Korea":"South Korea",
-                    "Diamond Princess":"Others",
-                    "Czechia":"Czech Republic",
-                    "UAE":"United Arab Emirates",
-                }
-                location = row['Country/Region']
-                if location in swap_locs.keys(): location = swap_locs.get(location)
-
-            #Add entry for this region if previously non-existent
-            if location.lower() not in cases.keys():
-                cases[location.lower()] = {'date':dates,
-                        'confirmed':[0 for i in range(len(dates))],
-                        'confirmed_normalized':[0 for i in range(len(dates))],
-                        'deaths':[0 for i in range(len(dates))],
-                        'recovered':[0 for i in range(len(dates))],
-                        'active':[0 for i in range(len(dates))],
-                        'daily':[0 for i in range(len(dates))],
-                        'daily_deaths':[0 for i in range(len(dates))]}
-
-            #Get index of date within list
-            idx = dates.index(start_date)
-            
-            #Manually edit data points that are inaccurate due to CSSE server maintenance
-            #Source: https://www.worldometers.info/coronavirus/#countries
-            if start_date == dt.datetime(2020,3,12):
-                check_idx = dates.index(dt.datetime(2020,3,11))
-                check_difference = abs(int(row['Confirmed']) - cases[location.lower()]['confirmed'][check_idx])
-                if location.lower() == 'italy' and check_difference < 200:
-                    row['Confirmed'] = 15113
-                    row['Deaths'] = 1016
-                    row['Recovered'] = 1258
-                if location.lower() == 'france' and check_difference < 200:
-                    row['Confirmed'] = 2876
-                    row['Deaths'] = 61
-                    row['Recovered'] = 12
-                if location.lower() == 'spain' and check_difference < 200:
-                    row['Confirmed'] = 3146
-                    row['Deaths'] = 86
-                    row['Recovered'] = 189
-                if location.lower() == 'germany' and check_difference < 200:
-                    row['Confirmed'] = 2745
-                    row['Deaths'] = 6
-                    row['Recovered'] = 25
-            if start_date == dt.datetime(2020,3,18) and worldometers == False:
-                if location.lower() == 'spain':
-                    row['Confirmed'] = 14769
-                if location.lower() == 'us':
-                    row['Confirmed'] = 9241
-
-            cases[location.lower()]['confirmed'][idx] += int(row['Confirmed'])
-            cases[location.lower()]['deaths'][idx] += int(row['Deaths'])
-            cases[location.lower()]['recovered'][idx] += int(row['Recovered'])
-            cases[location.lower()]['active'][idx] += int(row['Confirmed']) - int(row['Recovered']) - int(row['Deaths'])
-            if idx == 0:
-                cases[location.lower()]['daily'][idx] = np.nan
-                cases[location.lower()]['daily_deaths'][idx] = np.nan
-            elif location.lower() == 'mainland china' and strdate == '02-13-2020':
-                cases[location.lower()]['daily'][idx] = np.nan
-                cases[location.lower()]['daily_deaths'][idx] = np.nan
-            else:
-                daily_change = cases[location.lower()]['confirmed'][idx] - cases[location.lower()]['confirmed'][idx-1]
-                if negative_daily == False and daily_change < 0: daily_change = 0
-                cases[location.lower()]['daily_deaths'][idx] = daily_change
-                
-                daily_change = cases[location.lower()]['deaths'][idx] - cases[location.lower()]['deaths'][idx-1]
-                if negative_daily == False and daily_change < 0: daily_change = 0
-                cases[location.lower()]['daily_deaths'][idx] = daily_change
-                
-        #Normalize count by population
-        for key in cases.keys():
-            
-            #Get index of date within list
-            idx = dates.index(start_date)
-            
-            #If population data can be found for this country:
-            if key.lower() in population.keys():
-                
-                #Get country population data
-                country_pop = population.get(key.lower())
-                
-                #Add case count per 100,000 people
-                case_count = cases[key]['confirmed'][idx]
-                cases[key]['confirmed_normalized'][idx] = (float(case_count) / float(country_pop)) * 100000
-            
-            else:
-                
-                #Otherwise, add nan
-                cases[key]['confirmed_normalized'][idx] = 0.0
-
-        #Increment date by 1 day
-        start_date += dt.timedelta(hours=24)
-    
-    if save == True:
-        cases['dates'] = dates
-        with open('cases_world.pickle', 'wb') as f:
-            pickle.dump(cases, f, pickle.HIGHEST_PROTOCOL)
-    
-    return {'dates':dates,
-            'cases':cases}
+    for key in list(_datasets.keys()):
+        if scope is None or key[0] == scope: del _datasets[key]
@@ -0,0 +1,189 @@
+"""
+Render daemon
+This script loads the COVID-19 case data once and keeps it in memory, along with the state
+of each plot script (e.g., the map projection and shapefile of plot_conus_map.py). It then
+watches for new data and re-renders the configured plot scripts whenever the data changes.
+Each script requests the datasets it uses from read_data with its own settings, which are
+served from read_data's in-memory dataset cache.
+
+New CSSE reports are checked for every "update_interval" seconds, along with recent reports
+that are revalidated against the server; changes to the report cache or the Worldometers
+snapshot directory are checked for every "poll_interval" seconds. Updates read dates after
+the last date in memory, and re-read any earlier dates whose reports or snapshots changed.
+
+Figures that the plot scripts would display with plt.show() are saved to "output_directory"
+instead, named after the script and figure number.
+"""
+
+#Import packages & other scripts
+import os, sys
+import re
+import time
+import runpy
+import datetime as dt
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import fetch_data
+import read_data
+import worldometers_data
+
+#========================================================================================================
+# User-defined settings
+#========================================================================================================
+
+#Plot scripts to render
+scripts = ['plot_conus_map.py',
+           'plot_us_chart.py',
+           'plot_us_table.py',
+           'plot_world_chart.py',
+           'plot_world_table.py']
+
+#Directory to save rendered figures to
+output_directory = 'renders'
+
+#How often to check for new CSSE reports, in seconds
+update_interval = 900
+
+#How often to check the report cache and Worldometers directory for changes, in seconds
+poll_interval = 5
+
+#Report cache directory, which must match the one used by the plot scripts
+cache_dir = 'cache'
+
+#========================================================================================================
+# Data management
+#========================================================================================================
+
+#Variables holding case data in the plot scripts, cleared before each render so that scripts
+#request their datasets again from read_data
+data_names = ['cases','cases_us','dates','output','output_us']
+
+#Namespaces of each plot script, kept between renders
+namespaces = {}
+
+def update_data(reread_from=None):
+    """
+    Updates every dataset the scripts have requested from read_data, re-reading dates on or
+    after "reread_from" if passed. Returns True if any dataset changed.
+    """
+
+    return len(read_data.update_datasets(reread_from,cache_dir=cache_dir)) > 0
+
+def source_stamp():
+    """
+    Returns a dict of {path: (size, modification time)} of the files in the report cache and
+    Worldometers snapshot directory, which changes whenever a file is added or modified.
+    """
+
+    stamp = {}
+    for directory in [cache_dir,worldometers_data.WORLDOMETERS_DIR]:
+        if os.path.isdir(directory) == False: continue
+        for root, dirs, files in os.walk(directory):
+            for fname in files:
+                if fname.endswith('.csv') == False: continue
+                stat = os.stat(os.path.join(root,fname))
+                stamp[os.path.join(root,fname)] = (stat.st_size,stat.st_mtime_ns)
+    return stamp
+
+def changed_dates(old,new):
+    """
+    Returns the dates of report and snapshot files added, modified or removed between two
+    stamps, using the date in each file name.
+    """
+
+    dates = []
+    for path in set(old.keys()) | set(new.keys()):
+        if old.get(path) == new.get(path): continue
+        match = re.search(r'(\d{8})\.csv$',path)
+        if match is not None: dates.append(dt.datetime.strptime(match.group(1),'%Y%m%d'))
+    return dates
+
+def revalidation_start():
+    """
+    Returns the first date of recent reports that the report cache revalidates against the
+    server. These dates are re-read on every periodic update, since reading them is what
+    triggers the revalidation.
+    """
+
+    return dt.datetime.combine(dt.date.today() - dt.timedelta(days=fetch_data.REVALIDATE_DAYS),dt.time())
+
+#========================================================================================================
+# Rendering
+#========================================================================================================
+
+def render(script):
+    """
+    Runs a plot script with read_data's datasets in memory. Each script keeps its namespace
+    between renders, so objects it caches (e.g., map projections and shapefiles) are created
+    only once, while its case data is requested again from read_data's dataset cache.
+    """
+
+    namespace = {name:value for name,value in namespaces.get(script,{}).items() if name not in data_names}
+
+    #Save figures instead of displaying them
+    stem = os.path.splitext(os.path.basename(script))[0]
+    count = {'n':0}
+    def save_figure(*args,**kwargs):
+        count['n'] += 1
+        plt.savefig(os.path.join(output_directory,f"{stem}_{count['n']}.png"),bbox_inches='tight')
+    show = plt.show
+    plt.show = save_figure
+    try:
+        namespaces[script] = runpy.run_path(script,init_globals=namespace,run_name='__main__')
+    finally:
+        plt.show = show
+        plt.close('all')
+
+def render_all():
+    for script in scripts:
+        start = time.time()
+        try:
+            render(script)
+            print(f"--> Rendered {script} in {time.time()-start:.2f} seconds")
+        except Exception as e:
+            print(f"--> Failed to render {script}: {e}")
+
+#========================================================================================================
+# Main loop
+#========================================================================================================
+
+if __name__ == '__main__':
+    os.makedirs(output_directory,exist_ok=True)
+
+    #Scripts read the case data they use on their first render
+    print("--> Reading in COVID-19 case data")
+    render_all()
+    stamp = source_stamp()
+
+    last_update = time.time()
+    pending = []
+    while True:
+        time.sleep(poll_interval)
+
+        #Check for new data
+        new_stamp = source_stamp()
+        periodic = time.time() - last_update >= update_interval
+        if new_stamp == stamp and periodic == False: continue
+
+        #Re-read dates with changed files, and recent reports on periodic updates, along with
+        #dates from a failed update
+        reread = pending + changed_dates(stamp,new_stamp)
+        if periodic == True:
+            reread.append(revalidation_start())
+            last_update = time.time()
+
+        #Keep running if the update fails (e.g., a network error), and retry it later
+        print(f"--> Checking for new data ({dt.datetime.now().strftime('%H:%M:%S')})")
+        try:
+            changed = update_data(min(reread) if len(reread) > 0 else None)
+            pending = []
+        except Exception as e:
+            print(f"--> Failed to update data: {e}")
+            changed = False
+            pending = reread
+
+        #Reading reports marks cached files as used, so take a new stamp after every update
+        stamp = source_stamp()
+        if changed == True: render_all()
@@ -0,0 +1,104 @@
+"""
+Daily report schemas
+The CSSE daily report format changed several times: early files use "Province/State" and
+"Country/Region" headers, while later files use "Province_State" and "Country_Region" and add
+county-level columns such as "Admin2", "FIPS", "Lat" and "Long_". This module reads any of
+these formats into a frame with a fixed set of canonical columns. Each file's header row is
+fingerprinted and mapped to a cached parse plan, so only the needed columns are parsed, with
+pinned data types instead of type inference.
+"""
+
+import io
+import csv
+import numpy as np
+import pandas as pd
+
+#Canonical column names used by the loaders. Reports without county-level rows have an empty
+#"Admin2" (county) column.
+NAME_COLUMNS = ['Province/State','Country/Region','Admin2']
+COUNT_COLUMNS = ['Confirmed','Deaths','Recovered']
+
+#Header names used by the different report formats, mapped to their canonical column name
+HEADER_ALIASES = {
+    'Province/State':'Province/State',
+    'Province_State':'Province/State',
+    'Country/Region':'Country/Region',
+    'Country_Region':'Country/Region',
+    'Admin2':'Admin2',
+    'Confirmed':'Confirmed',
+    'Deaths':'Deaths',
+    'Recovered':'Recovered',
+}
+
+#Cache of parse plans, keyed by header row
+_plans = {}
+
+def parse_plan(header):
+    """
+    Returns the parse plan for a report with the passed header row. Plans are cached, so each
+    distinct report format is only analyzed once.
+
+    Parameters:
+    ----------------------
+    header
+        Header row of the report as a string, without the byte order mark.
+
+    Returns:
+    ----------------------
+    Dict with the following entries:
+    usecols     List of column names to read from the file.
+    dtype       Dict of pinned data types for those columns.
+    renames     Dict mapping file column names to canonical column names.
+    missing     List of canonical columns absent from the file, which are filled in.
+    """
+
+    if header in _plans: return _plans[header]
+
+    columns = next(csv.reader([header]))
+    renames = {}
+    for column in columns:
+        canonical = HEADER_ALIASES.get(column.strip())
+        if canonical is not None and canonical not in renames.values(): renames[column] = canonical
+    if 'Country/Region' not in renames.values():
+        raise ValueError(f"Unrecognized daily report header: {header}")
+
+    plan = {
+        'usecols':list(renames.keys()),
+        'dtype':{column:(str if renames[column] in NAME_COLUMNS else 'Int64') for column in renames.keys()},
+        'renames':renames,
+        'missing':[column for column in NAME_COLUMNS+COUNT_COLUMNS if column not in renames.values()],
+    }
+    _plans[header] = plan
+    return plan
+
+def read_report(content):
+    """
+    Parses a daily report into a frame with canonical columns.
+
+    Parameters:
+    ----------------------
+    content
+        Raw bytes of a CSSE daily report CSV file, in any of the published formats.
+
+    Returns:
+    ----------------------
+    pandas.DataFrame with "Province/State", "Country/Region" and "Admin2" string columns, with
+    missing names as empty strings, and "Confirmed", "Deaths" and "Recovered" integer columns,
+    with missing counts as zero.
+    """
+
+    #Strip byte order mark, then look up the plan for this header
+    if content.startswith(b'\xef\xbb\xbf'): content = content[3:]
+    header = content.split(b'\n',1)[0].decode('utf-8').rstrip('\r')
+    plan = parse_plan(header)
+
+    df = pd.read_csv(io.BytesIO(content),usecols=plan['usecols'],dtype=plan['dtype'],encoding='utf-8')
+    df = df.rename(columns=plan['renames'])
+
+    #Fill in missing values and columns
+    for column in NAME_COLUMNS:
+        df[column] = df[column].fillna('') if column in df.columns else ''
+    for column in COUNT_COLUMNS:
+        df[column] = df[column].fillna(0).astype(np.int64) if column in df.columns else 0
+
+    return df[NAME_COLUMNS+COUNT_COLUMNS]
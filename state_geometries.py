@@ -0,0 +1,149 @@
+"""
+Pre-projected state geometries
+Drawing the state shapefile with cartopy re-projects every vertex of every state each time a
+map is plotted. This module reads the shapefile once, projects each state into the map
+projection, clips it to the map extent, and computes its label anchor. The result is saved as
+an .npz file next to the shapefile, so later runs skip both the shapefile parsing and the
+projection. The cache is rebuilt whenever the shapefile, projection or extent changes.
+"""
+
+import os
+import hashlib
+import numpy as np
+import shapely.geometry as sgeom
+import cartopy.crs as ccrs
+from cartopy.io.shapereader import Reader
+from matplotlib.path import Path
+
+#Default shapefile of US states
+SHAPEFILE = 'cb_2018_us_state_500k/cb_2018_us_state_500k.shp'
+
+def _stamp(shapefile,proj,extent,name_field):
+    """
+    Returns a string identifying the shapefile by name, size and modification time, along with
+    the projection, extent and name field used to build the cache.
+    """
+
+    stat = os.stat(shapefile)
+    return f"{os.path.basename(shapefile)}:{stat.st_size}:{stat.st_mtime_ns}|{proj.proj4_init}|{extent}|{name_field}"
+
+def _clip_box(proj,extent):
+    """
+    Returns the bounding box of a lon/lat extent in map coordinates, as a shapely box.
+    """
+
+    lon = np.linspace(extent[0],extent[1],100)
+    lat = np.linspace(extent[2],extent[3],100)
+    boundary_lon = np.concatenate([lon,np.full(100,extent[1]),lon[::-1],np.full(100,extent[0])])
+    boundary_lat = np.concatenate([np.full(100,extent[2]),lat,np.full(100,extent[3]),lat[::-1]])
+    points = proj.transform_points(ccrs.PlateCarree(),boundary_lon,boundary_lat)
+    return sgeom.box(np.min(points[:,0]),np.min(points[:,1]),np.max(points[:,0]),np.max(points[:,1]))
+
+def _to_path(geometry):
+    """
+    Converts a shapely polygon or multipolygon into vertices and matplotlib path codes.
+    """
+
+    polygons = getattr(geometry,'geoms',[geometry])
+    vertices = []
+    codes = []
+    for polygon in polygons:
+        if polygon.is_empty or polygon.geom_type != 'Polygon': continue
+        for ring in [polygon.exterior] + list(polygon.interiors):
+            coords = np.asarray(ring.coords)[:,:2]
+            ring_codes = np.full(len(coords),Path.LINETO,dtype=np.uint8)
+            ring_codes[0] = Path.MOVETO
+            ring_codes[-1] = Path.CLOSEPOLY
+            vertices.append(coords)
+            codes.append(ring_codes)
+    if len(vertices) == 0: return np.zeros((0,2)), np.zeros(0,dtype=np.uint8)
+    return np.concatenate(vertices), np.concatenate(codes)
+
+def _build(shapefile,proj,extent,name_field):
+    """
+    Reads and projects the shapefile. Returns a dict of arrays, as stored in the cache file.
+    """
+
+    clip = _clip_box(proj,extent) if extent is not None else None
+    names = []
+    anchors = []
+    vertices = []
+    codes = []
+    offsets = [0]
+    reader = Reader(shapefile)
+    for record, geometry in zip(reader.records(),reader.geometries()):
+        names.append(record.attributes[name_field])
+
+        #Label anchor, from the centroid of the unprojected geometry
+        centroid = geometry.centroid.bounds
+        anchors.append([centroid[0],centroid[1]])
+
+        #Project into map coordinates & clip to the map extent
+        projected = proj.project_geometry(geometry,ccrs.PlateCarree())
+        if clip is not None: projected = projected.intersection(clip)
+        state_vertices, state_codes = _to_path(projected)
+        vertices.append(state_vertices)
+        codes.append(state_codes)
+        offsets.append(offsets[-1]+len(state_codes))
+
+    return {'names':np.array(names,dtype=str),
+            'anchors':np.array(anchors,dtype=np.float64).reshape(-1,2),
+            'vertices':np.concatenate(vertices) if len(vertices) > 0 else np.zeros((0,2)),
+            'codes':np.concatenate(codes) if len(codes) > 0 else np.zeros(0,dtype=np.uint8),
+            'offsets':np.array(offsets,dtype=np.int64)}
+
+def load(proj,extent=None,shapefile=SHAPEFILE,name_field='NAME',cache=True):
+    """
+    Loads the states of a shapefile, projected into map coordinates.
+
+    Parameters:
+    ----------------------
+    proj
+        Cartopy projection of the map.
+    extent
+        Map extent as [west, east, south, north] in degrees. Geometries are clipped to this
+        extent. If None, geometries are not clipped.
+    shapefile
+        Path of the shapefile (default is the 2018 US states shapefile).
+    name_field
+        Shapefile attribute holding the name of each state (default is "NAME").
+    cache
+        If True, projected geometries are read from an .npz file next to the shapefile, which
+        is rebuilt whenever the shapefile, projection or extent changes (default is True).
+
+    Returns:
+    ----------------------
+    Dict with the following entries, each in shapefile record order:
+    names       List of state names.
+    paths       List of matplotlib Path objects in map coordinates. States outside of the
+                extent have empty paths.
+    anchors     NumPy array of (lon, lat) label anchors, using each state's centroid.
+    """
+
+    stamp = _stamp(shapefile,proj,extent,name_field)
+    digest = hashlib.sha1(stamp.split('|',1)[1].encode('utf-8')).hexdigest()[:12]
+    path = f"{os.path.splitext(shapefile)[0]}_{digest}.npz"
+
+    #Read cache file if it is up to date, otherwise rebuild it
+    data = None
+    if cache == True and os.path.isfile(path) == True:
+        with np.load(path,allow_pickle=False) as npz:
+            if str(npz['stamp']) == stamp:
+                data = {key:npz[key] for key in ['names','anchors','vertices','codes','offsets']}
+    if data is None:
+        data = _build(shapefile,proj,extent,name_field)
+        if cache == True:
+            try:
+                with open(path+'.tmp','wb') as f:
+                    np.savez(f,stamp=np.array(stamp),**data)
+                os.replace(path+'.tmp',path)
+            except OSError:
+                pass
+
+    #Split vertices into one path per state
+    offsets = data['offsets']
+    paths = [Path(data['vertices'][offsets[i]:offsets[i+1]],data['codes'][offsets[i]:offsets[i+1]])
+             for i in range(len(offsets)-1)]
+    return {'names':[str(name) for name in data['names']],
+            'paths':paths,
+            'anchors':data['anchors']}
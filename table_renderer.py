@@ -0,0 +1,267 @@
+"""
+Table renderer
+This module draws tables of daily values as colored grids with a number in each cell, as a
+faster alternative to seaborn's heatmap for large tables. Cells are drawn as a single
+pcolormesh, numbers are formatted with vectorized NumPy operations, and all cell annotations
+are drawn as one PathCollection of text outlines instead of one text artist per cell. Tables
+can also be written as HTML or SVG files.
+"""
+
+import re
+import html
+import numpy as np
+import matplotlib.colors as col
+import matplotlib.transforms as mtransforms
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath, text_to_path
+
+#Outlines and advance widths of each glyph, keyed by (character, font size, font weight)
+_glyphs = {}
+
+def format_values(data,decimals=0,empty='-'):
+    """
+    Formats a 2D array of values as strings.
+
+    Parameters:
+    ----------------------
+    data
+        2D array of values.
+    decimals
+        Number of decimal places. If 0, values are truncated to integers (default is 0).
+    empty
+        String used for zero and NaN values (default is "-").
+
+    Returns:
+    ----------------------
+    2D NumPy array of strings
+    """
+
+    data = np.asarray(data,dtype=np.float64)
+    empty_mask = (data == 0) | np.isnan(data)
+    values = np.where(empty_mask,0,data)
+    if decimals == 0:
+        strings = np.char.mod('%d',np.trunc(values).astype(np.int64))
+    else:
+        strings = np.char.mod(f'%0.{decimals}f',values)
+    return np.where(empty_mask,empty,strings)
+
+def cell_colors(data,cmap,norm):
+    """
+    Returns the fill and text colors of each cell. Text is dark on light cells and white on dark
+    cells, as in seaborn's heatmap.
+
+    Returns:
+    ----------------------
+    Tuple of (fill RGBA array, text RGBA array), each with shape (rows, columns, 4)
+    """
+
+    fill = cmap(norm(np.ma.masked_invalid(np.asarray(data,dtype=np.float64))))
+
+    #Relative luminance of each cell
+    rgb = fill[...,:3]
+    rgb = np.where(rgb <= 0.03928,rgb/12.92,((rgb+0.055)/1.055)**2.4)
+    luminance = rgb @ np.array([0.2126,0.7152,0.0722])
+
+    text = np.where((luminance > 0.408)[...,None],col.to_rgba('.15'),col.to_rgba('w'))
+    return fill, text
+
+def _glyph(char,fontsize,fontweight):
+    """
+    Returns the outline vertices, path codes and advance width of a character, in points.
+    """
+
+    key = (char,fontsize,fontweight)
+    if key not in _glyphs:
+        prop = FontProperties(size=fontsize,weight=fontweight)
+        vertices, codes = text_to_path.get_text_path(prop,char)
+        vertices = np.asarray(vertices,dtype=np.float64).reshape(-1,2) * (fontsize/text_to_path.FONT_SCALE)
+        width = text_to_path.get_text_width_height_descent(char,prop,ismath=False)[0]
+        _glyphs[key] = (vertices,np.asarray(codes,dtype=np.uint8).reshape(-1),width)
+    return _glyphs[key]
+
+def _text_path(string,fontsize,fontweight,center):
+    """
+    Returns the outline of a string in points, centered horizontally on the origin and
+    vertically on "center". Outlines are assembled from cached glyphs, so each character is
+    only laid out once regardless of how many cells it appears in.
+    """
+
+    glyphs = [_glyph(char,fontsize,fontweight) for char in string]
+    advances = np.cumsum([0.0]+[glyph[2] for glyph in glyphs])
+    vertices = np.concatenate([glyph[0]+[x,0.0] for glyph,x in zip(glyphs,advances[:-1])]+[np.zeros((0,2))])
+    codes = np.concatenate([glyph[1] for glyph in glyphs]+[np.zeros(0,dtype=np.uint8)])
+    return Path(vertices-[advances[-1]/2.0,center],codes if len(codes) > 0 else None)
+
+def render_table(data,rows,columns,cmap,norm,annot=None,ax=None,fontsize=12,fontweight='normal',
+                 linewidths=0.5,linecolor='white',cbar=True,cbar_kws=None):
+    """
+    Draws a table of values as a colored grid.
+
+    Parameters:
+    ----------------------
+    data
+        2D array of values, with one row per table row. NaN values are left blank.
+    rows
+        List of row labels.
+    columns
+        List of column labels.
+    cmap
+        Matplotlib colormap, e.g., from Gradient.get_lut().
+    norm
+        Matplotlib normalization, e.g., Gradient.norm.
+    annot
+        2D array of strings to write in each cell, e.g., from format_values(). If None, cells
+        are not annotated.
+    ax
+        Axes instance to draw on. If None, the current axes is used.
+    fontsize
+        Font size of cell annotations (default is 12).
+    fontweight
+        Font weight of cell annotations (default is normal).
+    linewidths
+        Width of the lines between cells (default is 0.5).
+    linecolor
+        Color of the lines between cells (default is white).
+    cbar
+        Whether to draw a colorbar (default is True).
+    cbar_kws
+        Dict of arguments passed to fig.colorbar().
+
+    Returns:
+    ----------------------
+    Axes instance
+    """
+
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    fig = ax.figure
+    data = np.ma.masked_invalid(np.asarray(data,dtype=np.float64))
+    n_rows, n_columns = data.shape
+
+    #Draw cells
+    mesh = ax.pcolormesh(data,cmap=cmap,norm=norm,edgecolors=linecolor,linewidth=linewidths)
+    ax.set_xlim(0,n_columns)
+    ax.set_ylim(n_rows,0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    #Label rows & columns at cell centers
+    ax.set_xticks(np.arange(n_columns)+0.5)
+    ax.set_xticklabels(columns)
+    ax.set_yticks(np.arange(n_rows)+0.5)
+    ax.set_yticklabels(rows)
+
+    #Draw all annotations as one collection of text outlines, sized in points
+    if annot is not None:
+        annot = np.asarray(annot)
+        fill, text = cell_colors(data.filled(np.nan),cmap,norm)
+        cells = np.nonzero(~np.ma.getmaskarray(data))
+        digit = TextPath((0,0),'0',prop=FontProperties(size=fontsize,weight=fontweight)).get_extents()
+        paths = [_text_path(string,fontsize,fontweight,(digit.y0+digit.y1)/2.0) for string in annot[cells]]
+        offsets = np.column_stack([cells[1]+0.5,cells[0]+0.5])
+        points_to_pixels = mtransforms.Affine2D().scale(1.0/72.0) + fig.dpi_scale_trans
+        texts = PathCollection(paths,offsets=offsets,offset_transform=ax.transData,
+                               facecolors=text[cells],edgecolors='none',zorder=3)
+        texts.set_transform(points_to_pixels)
+        ax.add_collection(texts,autolim=False)
+
+    if cbar == True:
+        fig.colorbar(mesh,ax=ax,**(cbar_kws or {}))
+    return ax
+
+def _plain_label(label):
+    """
+    Returns a row or column label as plain text, along with whether it is bold. Mathtext bold
+    labels (e.g., r"$\\bf{Texas}$") are converted to plain text.
+    """
+
+    match = re.fullmatch(r'\$\\bf\{(.*)\}\$',label)
+    if match is not None: return match.group(1), True
+    return label, False
+
+def write_html(path,data,rows,columns,cmap,norm,annot=None,title=None):
+    """
+    Writes a table of values as an HTML file, with the same cell colors as render_table().
+    See render_table() for a description of the arguments.
+    """
+
+    data = np.asarray(data,dtype=np.float64)
+    fill, text = cell_colors(data,cmap,norm)
+    if annot is None: annot = format_values(data)
+    annot = np.asarray(annot)
+
+    lines = ['<!DOCTYPE html>','<html><head><meta charset="utf-8">',
+             '<style>table{border-collapse:collapse;font-family:sans-serif;font-size:12px}'+
+             'td,th{border:1px solid #fff;padding:2px 4px;text-align:center;white-space:nowrap}'+
+             'th.row{text-align:right}</style></head><body>']
+    if title is not None: lines.append(f'<h3>{html.escape(title)}</h3>')
+    lines.append('<table><tr><th></th>'+''.join([f'<th>{html.escape(column).replace(chr(10),"<br>")}</th>' for column in columns])+'</tr>')
+    for i, row in enumerate(rows):
+        label, bold = _plain_label(row)
+        label = f'<b>{html.escape(label)}</b>' if bold == True else html.escape(label)
+        cells = []
+        for j in range(data.shape[1]):
+            if np.isnan(data[i,j]):
+                cells.append('<td></td>')
+            else:
+                cells.append(f'<td style="background:{col.to_hex(fill[i,j])};color:{col.to_hex(text[i,j])}">{html.escape(annot[i,j])}</td>')
+        lines.append(f'<tr><th class="row">{label}</th>'+''.join(cells)+'</tr>')
+    lines.append('</table></body></html>')
+
+    with open(path,'w',encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+
+def write_svg(path,data,rows,columns,cmap,norm,annot=None,title=None,cell_width=48,cell_height=22,label_width=160):
+    """
+    Writes a table of values as an SVG file, with the same cell colors as render_table(). Cells
+    and labels are written as SVG rectangles and text, so the file stays small and searchable.
+    See render_table() for a description of the other arguments.
+
+    Parameters:
+    ----------------------
+    cell_width, cell_height
+        Size of each cell in pixels (default is 48 by 22).
+    label_width
+        Width of the row label column in pixels (default is 160).
+    """
+
+    data = np.asarray(data,dtype=np.float64)
+    fill, text = cell_colors(data,cmap,norm)
+    if annot is None: annot = format_values(data)
+    annot = np.asarray(annot)
+
+    title_height = 30 if title is not None else 0
+    header_height = 34
+    width = label_width + cell_width*data.shape[1]
+    height = title_height + header_height + cell_height*data.shape[0]
+
+    lines = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="sans-serif" font-size="12">']
+    if title is not None:
+        lines.append(f'<text x="4" y="20" font-size="16" font-weight="bold">{html.escape(title)}</text>')
+
+    #Column labels, with one line of text per label line
+    top = title_height
+    for j, column in enumerate(columns):
+        x = label_width + cell_width*(j+0.5)
+        for k, line in enumerate(column.split('\n')):
+            lines.append(f'<text x="{x}" y="{top+14+k*14}" text-anchor="middle">{html.escape(line)}</text>')
+
+    #Row labels & cells
+    top += header_height
+    for i, row in enumerate(rows):
+        y = top + cell_height*i
+        label, bold = _plain_label(row)
+        weight = ' font-weight="bold"' if bold == True else ''
+        lines.append(f'<text x="{label_width-6}" y="{y+cell_height*0.7}" text-anchor="end"{weight}>{html.escape(label)}</text>')
+        for j in range(data.shape[1]):
+            if np.isnan(data[i,j]): continue
+            x = label_width + cell_width*j
+            lines.append(f'<rect x="{x}" y="{y}" width="{cell_width}" height="{cell_height}" fill="{col.to_hex(fill[i,j])}" stroke="#ffffff"/>')
+            lines.append(f'<text x="{x+cell_width/2}" y="{y+cell_height*0.7}" text-anchor="middle" fill="{col.to_hex(text[i,j])}">{html.escape(annot[i,j])}</text>')
+    lines.append('</svg>')
+
+    with open(path,'w',encoding='utf-8') as f:
+        f.write('\n'.join(lines))
@@ -0,0 +1,217 @@
+"""
+Worldometers snapshot index
+Worldometers data is stored as one scraped CSV file per dataset and date, named
+"data/worldometers/{scope}_{YYYYMMDD}.csv". This module lists the directory once to find
+the available snapshots, and consolidates all snapshots of a dataset into a single columnar
+.npz file, which is rebuilt whenever snapshot files are added or changed. Rows of the
+consolidated file are stored in date order with the offset of each date's rows, so a single
+date can be read without loading the other dates.
+"""
+
+import os
+import re
+import struct
+import zipfile
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+#Directory holding the Worldometers snapshots
+WORLDOMETERS_DIR = 'data/worldometers'
+
+#Columns read from each snapshot
+COLUMNS = ['State','Total Cases','Total Deaths','Total Recovered']
+
+#Snapshot file name pattern
+_snapshot_name = re.compile(r'^(?P<scope>[a-z]+)_(?P<date>\d{8})\.csv$')
+
+def scan(directory=WORLDOMETERS_DIR):
+    """
+    Lists the snapshot directory once and returns a dict of {scope: {date: filename}}, with
+    dates as datetime objects in ascending order.
+    """
+
+    index = {}
+    if os.path.isdir(directory) == False: return index
+    for entry in os.scandir(directory):
+        match = _snapshot_name.match(entry.name)
+        if match is None or entry.is_file() == False: continue
+        date = dt.datetime.strptime(match.group('date'),'%Y%m%d')
+        index.setdefault(match.group('scope'),{})[date] = entry.name
+    for scope in index.keys():
+        index[scope] = dict(sorted(index[scope].items()))
+    return index
+
+def _stamp(directory,filenames):
+    """
+    Returns a string identifying the passed snapshot files by name, size and modification time.
+    """
+
+    stamp = []
+    for filename in filenames:
+        stat = os.stat(os.path.join(directory,filename))
+        stamp.append(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}")
+    return '|'.join(stamp)
+
+def _read_csvs(directory,files):
+    """
+    Reads snapshot CSV files into one frame with a "date" column.
+    """
+
+    frames = []
+    for date, filename in files.items():
+        df = pd.read_csv(os.path.join(directory,filename),usecols=COLUMNS,thousands=',')
+        df[COLUMNS[1:]] = df[COLUMNS[1:]].fillna(0)
+        df['date'] = np.datetime64(date,'D')
+        frames.append(df)
+    if len(frames) == 0: return pd.DataFrame(columns=COLUMNS+['date'])
+    return pd.concat(frames,ignore_index=True)
+
+def _consolidate(scope,directory,files):
+    """
+    Returns the path of the consolidated .npz file of a dataset, rebuilding it from the CSV
+    files if it is missing or out of date. Returns None if the file cannot be written.
+    """
+
+    path = os.path.join(directory,f'{scope}_snapshots.npz')
+    stamp = _stamp(directory,files.values())
+    if os.path.isfile(path) == True:
+        with np.load(path,allow_pickle=False) as data:
+            if 'offsets' in data.files and str(data['stamp']) == stamp: return path
+
+    #Rows are written in date order, with the row offset of each date
+    df = _read_csvs(directory,files)
+    counts = np.array([np.sum(df['date'].to_numpy() == np.datetime64(date,'D')) for date in files.keys()],dtype=np.int64)
+    try:
+        with open(path+'.tmp','wb') as f:
+            np.savez(f,stamp=np.array(stamp),
+                     dates=np.array([np.datetime64(date,'D') for date in files.keys()],dtype='datetime64[D]'),
+                     offsets=np.concatenate([[0],np.cumsum(counts)]).astype(np.int64),
+                     State=df['State'].astype(str).to_numpy(dtype=str),
+                     confirmed=df['Total Cases'].to_numpy(dtype=np.float64),
+                     deaths=df['Total Deaths'].to_numpy(dtype=np.float64),
+                     recovered=df['Total Recovered'].to_numpy(dtype=np.float64))
+        os.replace(path+'.tmp',path)
+    except OSError:
+        return None
+    return path
+
+def _map_npz(path,names):
+    """
+    Memory-maps arrays of an uncompressed .npz file, as written by np.savez. Returns a dict of
+    {name: array}, or None if any of the arrays cannot be memory-mapped.
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path,'rb') as f:
+        for name in names:
+            info = zf.getinfo(f'{name}.npy')
+            if info.compress_type != zipfile.ZIP_STORED: return None
+
+            #Skip the zip entry's local header, then read the .npy header
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH',f.read(30)[26:30])
+            f.seek(info.header_offset+30+name_length+extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1,0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2,0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                return None
+            if dtype.hasobject == True or len(shape) != 1: return None
+
+            if shape[0] == 0:
+                arrays[name] = np.zeros(0,dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path,dtype=dtype,mode='r',offset=f.tell(),shape=shape)
+    return arrays
+
+class SnapshotReader:
+
+    def __init__(self,scope,directory=WORLDOMETERS_DIR,consolidate=True,index=None):
+        """
+        Reads the snapshots of a dataset one date at a time. Rows are read from a memory-mapped
+        consolidated "{scope}_snapshots.npz" file in the snapshot directory, which is rebuilt
+        from the CSV files whenever they change, so only the requested date is loaded.
+
+        Parameters:
+        ----------------------
+        scope
+            String denoting the dataset ("us" or "world").
+        directory
+            Directory holding the snapshots (default is "data/worldometers").
+        consolidate
+            If True, snapshots are read from the consolidated file. If False, or if the
+            consolidated file cannot be written, each date's CSV file is read (default is True).
+        index
+            Dict returned by scan(). If None, the directory is scanned.
+
+        Returns:
+        ----------------------
+        Instance of a SnapshotReader object
+        """
+
+        if index is None: index = scan(directory)
+        self.directory = directory
+        self.files = index.get(scope,{})
+
+        #Row offsets of each date in the consolidated file
+        self.arrays = None
+        self.offsets = {}
+        path = _consolidate(scope,directory,self.files) if consolidate == True and len(self.files) > 0 else None
+        if path is not None:
+            with np.load(path,allow_pickle=False) as data:
+                dates = data['dates'].astype('datetime64[us]').tolist()
+                offsets = data['offsets']
+            self.offsets = {date:(offsets[i],offsets[i+1]) for i,date in enumerate(dates)}
+            self.arrays = _map_npz(path,['State','confirmed','deaths','recovered'])
+
+    def dates(self):
+        return list(self.files.keys())
+
+    def __contains__(self,date):
+        return date in self.files
+
+    def __getitem__(self,date):
+        """
+        Returns the snapshot of a date as a DataFrame with the columns "State", "Total Cases",
+        "Total Deaths" and "Total Recovered".
+        """
+
+        if date not in self.files: raise KeyError(date)
+        if self.arrays is None or date not in self.offsets:
+            return _read_csvs(self.directory,{date:self.files[date]})[COLUMNS]
+
+        start, end = self.offsets[date]
+        return pd.DataFrame({'State':np.array(self.arrays['State'][start:end]),
+                             'Total Cases':np.array(self.arrays['confirmed'][start:end]),
+                             'Total Deaths':np.array(self.arrays['deaths'][start:end]),
+                             'Total Recovered':np.array(self.arrays['recovered'][start:end])},columns=COLUMNS)
+
+def load(scope,directory=WORLDOMETERS_DIR,consolidate=True,index=None):
+    """
+    Loads all snapshots of a dataset. To read one date at a time without loading every
+    snapshot, use SnapshotReader.
+
+    Parameters:
+    ----------------------
+    scope
+        String denoting the dataset ("us" or "world").
+    directory
+        Directory holding the snapshots (default is "data/worldometers").
+    consolidate
+        If True, snapshots are read from a consolidated "{scope}_snapshots.npz" file in the
+        same directory, which is rebuilt from the CSV files whenever they change. If False,
+        every CSV file is read (default is True).
+    index
+        Dict returned by scan(). If None, the directory is scanned.
+
+    Returns:
+    ----------------------
+    Dict of {date: DataFrame}, where each DataFrame has the columns "State", "Total Cases",
+    "Total Deaths" and "Total Recovered" of that date's snapshot.
+    """
+
+    reader = SnapshotReader(scope,directory,consolidate,index)
+    return {date:reader[date] for date in reader.dates()}